@@ -0,0 +1,108 @@
+"""Time the invitee index rebuild and a mass prune of invited members against the old per-leave scan
+
+Run from the repository root: python bench/bench_invitee_index.py [tracked invites] [members pruned]
+"""
+import asyncio
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+INVITES_PER_INVITER = 5
+GUILD_ID = 7
+
+
+class FakeGuild:
+    id = GUILD_ID
+
+    def get_member(self, member_id):
+        return None  # inviters aren't cached, so no role updates are timed
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeRemovePayload:
+    guild_id = GUILD_ID
+
+    def __init__(self, user_id):
+        self.user = FakeUser(user_id)
+
+
+def make_tracking(invite_count, rng):
+    """invite_tracking rows shaped like on_member_join writes them, some invitees already gone"""
+    tracking = {}
+    invitee_id = 10**6
+    for inviter_id in range(invite_count // INVITES_PER_INVITER):
+        invited_users = []
+        for _ in range(INVITES_PER_INVITER):
+            invitee_id += 1
+            invited_user = {'user_id': invitee_id, 'joined_at': '2024-01-01T00:00:00'}
+            if rng.random() < 0.1:
+                invited_user['left_at'] = '2024-02-01T00:00:00'
+            invited_users.append(invited_user)
+        active = sum('left_at' not in invited_user for invited_user in invited_users)
+        tracking[inviter_id] = {'invites': active, 'invited_users': invited_users}
+    return tracking
+
+
+def old_prune(tracking, member_ids):
+    """on_member_remove before the index: scan every inviter's list for each member who leaves"""
+    for member_id in member_ids:
+        for inviter_id, data in tracking.items():
+            for invited_user in data['invited_users']:
+                if invited_user['user_id'] == member_id:
+                    if data['invites'] > 0:
+                        data['invites'] -= 1
+                    invited_user['left_at'] = '2024-03-01T00:00:00'
+                    break
+
+
+def main_bench(invite_count, prune_count):
+    rng = random.Random(4)
+    tracking = make_tracking(invite_count, rng)
+    present = [invited_user['user_id'] for data in tracking.values() for invited_user in data['invited_users'] if 'left_at' not in invited_user]
+    leaving = rng.sample(present, prune_count)
+
+    state = main.GuildState(GUILD_ID)
+    state.invite_tracking = copy.deepcopy(tracking)
+    start = time.perf_counter()
+    state.rebuild_invitee_index()
+    rebuild = time.perf_counter() - start
+
+    guild = FakeGuild()
+    main.bot.get_guild = lambda guild_id: guild
+    main.guild_states[GUILD_ID] = state
+
+    async def prune():
+        for member_id in leaving:
+            await main.on_raw_member_remove(FakeRemovePayload(member_id))
+
+    start = time.perf_counter()
+    asyncio.run(prune())
+    indexed = time.perf_counter() - start
+
+    old_tracking = copy.deepcopy(tracking)
+    start = time.perf_counter()
+    old_prune(old_tracking, leaving)
+    scanned = time.perf_counter() - start
+
+    counts = {inviter_id: data['invites'] for inviter_id, data in state.invite_tracking.items()}
+    assert counts == {inviter_id: data['invites'] for inviter_id, data in old_tracking.items()}
+    print(f"{invite_count} tracked invites, {len(state.invitee_index) + prune_count} members still in the guild")
+    print(f"index rebuild       {rebuild * 1000:8.1f}ms")
+    print(f"prune {prune_count}, indexed  {indexed * 1000:8.1f}ms")
+    print(f"prune {prune_count}, scanned  {scanned * 1000:8.1f}ms")
+
+
+if __name__ == '__main__':
+    main_bench(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5000,
+    )
@@ -0,0 +1,75 @@
+"""Memory held for a large guild's members with the full member cache versus low memory mode
+
+Run from the repository root: python bench/bench_low_memory.py [members]
+Each mode runs in its own process so their RSS readings don't mix. Linux only (reads /proc).
+"""
+import gc
+import os
+import random
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROLE_COUNT = 30
+REACTING_SHARE = 0.02  # members who click a reaction role in low memory mode and get kept in MemberCache
+
+
+def rss_mb():
+    return int(open('/proc/self/statm').read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def member_data(index, rng):
+    """A GUILD_MEMBERS_CHUNK entry, as the gateway sends it"""
+    return {
+        'user': {'id': str(10**17 + index), 'username': f"user{index}", 'discriminator': '0', 'global_name': f"User {index}", 'avatar': 'a' * 32},
+        'roles': [str(7 + rng.randrange(ROLE_COUNT)) for _ in range(3)],
+        'joined_at': '2024-01-01T00:00:00+00:00',
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    }
+
+
+def measure(mode, member_count):
+    import main
+    from discord.guild import Guild
+    from discord.member import Member
+
+    connection = main.bot._connection
+    roles = [
+        {'id': str(7 + index), 'name': f"role{index}", 'permissions': '0', 'position': index, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}
+        for index in range(ROLE_COUNT)
+    ]
+    guild = Guild(data={'id': '7', 'name': 'big', 'roles': roles, 'member_count': member_count}, state=connection)
+    rng = random.Random(1)
+
+    gc.collect()
+    before = rss_mb()
+    if mode == 'full':
+        # What chunk_guilds_at_startup builds
+        for index in range(member_count):
+            guild._add_member(Member(data=member_data(index, rng), guild=guild, state=connection))
+    else:
+        cache = main.MemberCache(main.MEMBER_CACHE_SIZE, main.MEMBER_CACHE_TTL)
+        for index in range(member_count):
+            if rng.random() < REACTING_SHARE:
+                cache.remember(Member(data=member_data(index, rng), guild=guild, state=connection))
+    gc.collect()
+    return rss_mb() - before
+
+
+def main_bench(member_count):
+    for mode in ('full', 'low'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--measure', mode, str(member_count)],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()[-1]
+        print(f"{mode:>4}  {member_count} members  {float(output):.0f} MB")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        print(measure(sys.argv[2], int(sys.argv[3])))
+    else:
+        main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,65 @@
+"""Time TriggerEngine against the old per-trigger `in` scan as the autoresponder count grows
+
+Run from the repository root: python bench/bench_matcher.py [messages]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+TRIGGER_COUNTS = (10, 64, 100, 128, 250, 1000, 5000, 10000)
+
+
+def make_triggers(count, rng):
+    """Plain substring triggers of two to four words, like most servers configure"""
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(2000)]
+    triggers = set()
+    while len(triggers) < count:
+        triggers.add(' '.join(rng.sample(words, rng.randint(2, 4))))
+    return sorted(triggers), words
+
+
+def make_messages(count, triggers, words, rng):
+    """Chat-sized messages, one in ten containing a trigger"""
+    messages = []
+    for index in range(count):
+        message = ' '.join(rng.choices(words, k=rng.randint(5, 30)))
+        if index % 10 == 0:
+            message += ' ' + rng.choice(triggers)
+        messages.append(message)
+    return messages
+
+
+def linear_scan(triggers, text):
+    return [trigger for trigger in triggers if trigger in text]
+
+
+def timed(function, messages):
+    start = time.perf_counter()
+    for message in messages:
+        function(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main_bench(message_count):
+    rng = random.Random(1)
+    print(f"{'triggers':>8}  {'linear us/msg':>14}  {'engine us/msg':>14}  {'speedup':>8}")
+    for count in TRIGGER_COUNTS:
+        triggers, words = make_triggers(count, rng)
+        messages = make_messages(message_count, triggers, words, rng)
+        engine = main.TriggerEngine(triggers)
+
+        for message in messages[:200]:
+            assert engine.find_all(message) == linear_scan(triggers, message)
+
+        linear = timed(lambda text: linear_scan(triggers, text), messages)
+        matched = timed(engine.find_all, messages)
+        print(f"{count:>8}  {linear:>14.1f}  {matched:>14.1f}  {linear / matched:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
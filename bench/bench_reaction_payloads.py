@@ -0,0 +1,109 @@
+"""Replay raw reaction payloads through the reaction role add handler, before and after keying by emoji ID
+
+Run from the repository root: python bench/bench_reaction_payloads.py [payloads]
+Role changes are counted instead of sent, so only the handler's own work is timed.
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+import discord
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+WATCHED_MESSAGE = 555
+WATCHED_SHARE = 0.1  # payloads on the reaction role message; the rest are reactions anywhere else
+BOT_USER_ID = 1
+
+
+class FakeGuild:
+    id = 7
+
+    def __init__(self):
+        self.members = {}
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+    def get_role(self, role_id):
+        return discord.Object(id=role_id)
+
+
+class FakeMember:
+    def __init__(self, member_id, guild):
+        self.id = member_id
+        self.guild = guild
+        self.roles = []
+        self._roles = []
+
+
+class CountingDebouncer:
+    def __init__(self):
+        self.changes = []
+
+    def add(self, member, message_id, role_id, added):
+        self.changes.append((member.id, role_id))
+
+
+def make_payloads(count):
+    rng = random.Random(1)
+    emojis = [
+        discord.PartialEmoji(name='🎮'),
+        discord.PartialEmoji(name='pepe', id=123456789012345678),
+        discord.PartialEmoji(name='wave', id=987654321098765432),
+        discord.PartialEmoji(name='👍'),  # not mapped
+    ]
+    payloads = []
+    for _ in range(count):
+        message_id = WATCHED_MESSAGE if rng.random() < WATCHED_SHARE else rng.randrange(10**17, 10**18)
+        data = {'message_id': message_id, 'channel_id': 1, 'user_id': rng.randrange(2, 10**6), 'guild_id': FakeGuild.id, 'type': 0, 'burst': False}
+        payloads.append(discord.RawReactionActionEvent(data, rng.choice(emojis), 'REACTION_ADD'))
+    return payloads
+
+
+def main_bench(payload_count):
+    guild = FakeGuild()
+    main.bot.get_guild = lambda guild_id: guild
+    type(main.bot).user = property(lambda bot: discord.Object(id=BOT_USER_ID))
+    main.member_cache = main.MemberCache(0, main.MEMBER_CACHE_TTL)
+    main.reaction_roles = {WATCHED_MESSAGE: {'roles': {'🎮': 1, 123456789012345678: 2, 987654321098765432: 3}, 'mode': 'toggle', 'limit': 0}}
+    old_reaction_roles = {WATCHED_MESSAGE: {'🎮': 1, '<:pepe:123456789012345678>': 2, '<:wave:987654321098765432>': 3}}
+    old_changes = []
+
+    async def old_on_raw_reaction_add(payload):
+        """The handler before reaction roles were keyed by ID, with the role call counted instead of made"""
+        if payload.user_id == main.bot.user.id:
+            return
+        if payload.message_id in old_reaction_roles:
+            guild = main.bot.get_guild(payload.guild_id)
+            member = guild.get_member(payload.user_id)
+            emoji = str(payload.emoji)
+            if emoji in old_reaction_roles[payload.message_id]:
+                role_id = old_reaction_roles[payload.message_id][emoji]
+                role = guild.get_role(role_id)
+                if role and member:
+                    old_changes.append((member.id, role_id))
+
+    payloads = make_payloads(payload_count)
+    guild.members = {payload.user_id: FakeMember(payload.user_id, guild) for payload in payloads}
+    main.reaction_debouncer = CountingDebouncer()
+
+    async def replay(handler):
+        start = time.perf_counter()
+        for payload in payloads:
+            await handler(payload)
+        return (time.perf_counter() - start) * 1000
+
+    before = asyncio.run(replay(old_on_raw_reaction_add))
+    after = asyncio.run(replay(main.on_raw_reaction_add))
+    assert old_changes == main.reaction_debouncer.changes
+    print(f"{payload_count} payloads, {WATCHED_SHARE:.0%} on a watched message")
+    print(f"before  {before:.1f}ms")
+    print(f" after  {after:.1f}ms  ({len(old_changes)} role changes from both)")
+
+
+if __name__ == '__main__':
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
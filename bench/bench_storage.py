@@ -0,0 +1,72 @@
+"""Load time and write amplification of BotStorage with a large invite-tracking dataset
+
+Run from the repository root: python bench/bench_storage.py [tracked members]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+INVITES_PER_INVITER = 5
+GUILD_ID = 7
+UPDATES = 1000
+UPDATED_INVITERS = 100
+
+
+def make_record(inviter_id):
+    invited_users = [
+        {'user_id': 10**17 + inviter_id * INVITES_PER_INVITER + index, 'joined_at': '2024-01-01T00:00:00.000000'}
+        for index in range(INVITES_PER_INVITER)
+    ]
+    return {'invites': INVITES_PER_INVITER, 'invited_users': invited_users}
+
+
+def main_bench(member_count):
+    inviter_count = member_count // INVITES_PER_INVITER
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as directory:
+        storage = main.BotStorage(os.path.join(directory, 'bench.db'))
+        storage.open()
+
+        for inviter_id in range(inviter_count):
+            storage.put('invite_tracking', inviter_id, make_record(inviter_id), scope=GUILD_ID)
+        start = time.perf_counter()
+        storage.write_batch(storage.take_pending())
+        storage.unwritten = {}
+        initial = time.perf_counter() - start
+        storage.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+        # A fresh connection, as after a restart
+        storage = main.BotStorage(storage.path)
+        start = time.perf_counter()
+        storage.open()
+        tracking = storage.load('invite_tracking', GUILD_ID)
+        load = time.perf_counter() - start
+        assert len(tracking) == inviter_count
+
+        # Joins credited to a handful of busy inviters between two flushes
+        busy = rng.sample(sorted(tracking), UPDATED_INVITERS)
+        for _ in range(UPDATES):
+            inviter_id = rng.choice(busy)
+            tracking[inviter_id]['invites'] += 1
+            storage.put('invite_tracking', inviter_id, tracking[inviter_id], scope=GUILD_ID)
+        start = time.perf_counter()
+        storage.write_batch(storage.take_pending())
+        storage.unwritten = {}
+        flush = time.perf_counter() - start
+        storage.close()
+
+    print(f"{inviter_count} inviters, {inviter_count * INVITES_PER_INVITER} tracked members")
+    print(f"initial write  {initial:6.2f}s  {size / 1e6:.0f} MB on disk")
+    print(f"full load      {load:6.2f}s")
+    print(f"{UPDATES} updates over {UPDATED_INVITERS} inviters: {storage.stats['rows_written']} rows, "
+          f"{storage.stats['bytes_written'] / 1e3:.0f} KB in {flush * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main_bench(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
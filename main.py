@@ -1,10 +1,13 @@
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 import json
 import asyncio
 import time
+import sqlite3
+import threading
+import signal
 from typing import Optional, List
 from datetime import datetime, timedelta
 import pytz
@@ -13,66 +16,467 @@ import os
 import io
 from PIL import Image
 import random
+import bisect
+import re
+import heapq
+import multiprocessing
+import hashlib
+import sys
+import unicodedata
+import traceback
+from collections import deque, OrderedDict
+from functools import lru_cache
+try:
+    from re import _parser as sre_parse, _constants as sre_constants, _compiler as sre_compile
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+    import sre_compile
 
 # Bot configuration
 ALLOWED_GUILD_IDS = []  # Configure this list with guild IDs to restrict bot usage
 BOT_TOKEN = None  # Will be loaded from environment variable
+DATABASE_PATH = os.getenv('BOT_DB_PATH', 'bot_data.db')
+# Skips member chunking and the member cache; boost tracking needs that cache and sees no boosts in this mode
+LOW_MEMORY_MODE = os.getenv('BOT_LOW_MEMORY', '').lower() in ('1', 'true', 'yes')
+MEMBER_CACHE_SIZE = 5000  # members kept for reaction and invite lookups in low memory mode
+MEMBER_CACHE_TTL = 300  # seconds before a kept member is fetched again
+STORAGE_FLUSH_INTERVAL = 5  # seconds between batched writes to disk
+STATS_FLUSH_INTERVAL = 60  # seconds between saves of autoresponder statistics
+INVITE_JOIN_WINDOW = 1.5  # seconds of joins gathered into one invite fetch
+INVITE_SLOT_TTL = 60  # seconds an invite use waits for its join event before it is dropped
+INVITE_SLOT_LIMIT = 25  # invite uses kept waiting for join events at most
+REACTION_DEBOUNCE = 1.0  # seconds of one member's reaction role clicks folded into one role edit
+ROLE_QUEUE_WORKERS = 4  # role edits in flight at once, at most one per guild
+PERMISSION_CACHE_SIZE = 4096  # (role set, command) permission results remembered per guild
+SEND_QUEUE_LIMIT = 20  # messages waiting per channel before the oldest is dropped
+LATENCY_BUCKETS = 24  # log2 microsecond buckets in the match latency histogram
+EMBED_STORAGE_LIMIT = 500  # sent embeds remembered before the oldest are evicted
+AUTORESPONDER_PAGE_SIZE = 10  # autoresponders per page in the browser
+IMPORT_MAX_BYTES = 16 * 1024 * 1024  # largest autoresponder import file accepted
+IMPORT_ERROR_LIMIT = 20  # validation errors listed in an import report
+REGEX_MAX_LENGTH = 200  # characters allowed in a regex trigger
+REGEX_TIMEOUT = 0.25  # seconds a message's regex triggers may take before their worker process is killed
+REGEX_TEXT_LIMIT = 200  # leading characters of a message that regex triggers are run against
+REGEX_NESTED_REPEAT_LIMIT = 100  # total repetitions allowed when repeats are nested
+REGEX_CHOICE_LIMIT = 4096  # ways a regex trigger's optional parts and alternatives may split a message
+NORMALIZE_CACHE_SIZE = 1024  # non-ASCII messages whose normalized text is kept for repeats
+STARTUP_CONCURRENCY = 8  # guilds warmed up at once in on_ready
+PROCESS_START = time.monotonic()
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 intents.guilds = True
 intents.invites = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+bot = commands.Bot(
+    command_prefix='!',
+    intents=intents,
+    chunk_guilds_at_startup=not LOW_MEMORY_MODE,
+    member_cache_flags=discord.MemberCacheFlags.none() if LOW_MEMORY_MODE else discord.MemberCacheFlags.from_intents(intents)
+)
 
 # Data storage
-autoresponders = {}
 auction_settings = {
     'channel_id': None,
     'format': 'thread',  # 'thread', 'channel', 'forum'
     'forum_channel_id': None
 }
 
-# Enhanced bot configuration with default Administrator requirements
-bot_config = {
-    'command_permissions': {
-        'config': [],
-        'autoresponder': [],
-        'autoresponders': [],
-        'auctionsetup': [],
-        'auctioncreate': [],
-        'embedcreator': [],
-        'reactionroles': [],
-        'boostsetup': [],
-        'invitesetup': [],
-        'invites': [],
-        'connect4': [],
-        'endgame': [],
-        'test_autoresponder': [],
-        'export_autoresponders': []
-    },  # command_name: [role_ids] - empty means Administrator required
-    'admin_roles': [],
-    'moderator_roles': []
-}
+# Commands that can be restricted to roles - empty role list means Administrator required
+COMMAND_NAMES = [
+    'config',
+    'autoresponder',
+    'autoresponders',
+    'auctionsetup',
+    'auctioncreate',
+    'embedcreator',
+    'reactionroles',
+    'boostsetup',
+    'invitesetup',
+    'invites',
+    'connect4',
+    'endgame',
+    'test_autoresponder',
+    'export_autoresponders',
+    'import_autoresponders',
+    'autoresponder_stats',
+    'send_embed_template',
+    'delete_embed_template'
+]
 
-boost_settings = {
-    'roles': {},  # boost_count: role_id
-    'tracking': {},  # user_id: {'boosts': count, 'boost_history': [], 'current_boost_start': timestamp}
-    'guild_boost_count': {}  # guild_id: total_boosts (for comparison)
-}
+# Per-guild configuration, autoresponders and tracking data
+guild_states = {}  # guild_id: GuildState
 
-invite_settings = {
-    'roles': {},  # invite_count: role_id
-    'tracking': {},  # user_id: {'invites': count, 'invited_users': []}
-    'invite_cache': {}  # invite_code: uses
-}
-
-embed_storage = {}  # message_id: embed_data
-reaction_roles = {}  # message_id: {emoji: role_id}
+embed_storage = {}  # message_id: embed_data, oldest first and capped at EMBED_STORAGE_LIMIT
+reaction_roles = {}  # message_id: {'roles': {emoji key: role_id}, 'mode', 'limit'}, see reaction_emoji_key
 
 # Connect 4 game storage
 active_games = {}  # channel_id: game_data
 
+# on_ready fires again after a session is re-established, so remember what startup already did
+startup_state = {'tree_synced': False, 'ready_count': 0, 'boost_counts': {}}
+startup_lock = asyncio.Lock()
+
+_DELETED = object()  # Marks a pending storage row for deletion
+
+class BotStorage:
+    """SQLite (WAL) key-value store with batched background writes"""
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        self.lock = threading.Lock()
+        self.pending = {}  # (namespace, scope, key): value
+        self.unwritten = {}  # serialized rows from a batch that failed to commit
+        self.stats = {'puts': 0, 'flushes': 0, 'rows_written': 0, 'bytes_written': 0}
+    
+    def open(self):
+        """Open the database and create the schema if needed"""
+        if self.connection:
+            return
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "namespace TEXT NOT NULL, scope INTEGER NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (namespace, scope, key)) WITHOUT ROWID"
+        )
+    
+    def close(self):
+        """Write anything still pending and close the database"""
+        if not self.connection:
+            return
+        self.write_batch(self.take_pending())
+        self.unwritten = {}
+        self.connection.close()
+        self.connection = None
+    
+    @staticmethod
+    def encode_key(key):
+        return json.dumps(key)
+    
+    @staticmethod
+    def decode_key(raw_key):
+        key = json.loads(raw_key)
+        return tuple(key) if isinstance(key, list) else key
+    
+    def put(self, namespace, key, value, scope=0):
+        """Queue a row write; repeated puts of the same key before a flush collapse into one"""
+        self.pending[(namespace, scope, self.encode_key(key))] = value
+        self.stats['puts'] += 1
+    
+    def delete(self, namespace, key, scope=0):
+        """Queue a row deletion"""
+        self.pending[(namespace, scope, self.encode_key(key))] = _DELETED
+        self.stats['puts'] += 1
+    
+    def load(self, namespace, scope=0):
+        """Read every row of a namespace into a dict"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT key, value FROM state WHERE namespace = ? AND scope = ?",
+                (namespace, scope)
+            ).fetchall()
+        return {self.decode_key(key): json.loads(value) for key, value in rows}
+    
+    def take_pending(self):
+        """Serialize queued writes on the event loop so handlers can't mutate them mid-write"""
+        pending, self.pending = self.pending, {}
+        batch = dict(self.unwritten)
+        for row_key, value in pending.items():
+            batch[row_key] = None if value is _DELETED else json.dumps(value)
+        self.unwritten = batch
+        return batch
+    
+    def write_batch(self, batch):
+        """Commit a serialized batch in a single transaction"""
+        if not batch:
+            return
+        
+        upserts = [(namespace, scope, key, value) for (namespace, scope, key), value in batch.items() if value is not None]
+        deletes = [row_key for row_key, value in batch.items() if value is None]
+        
+        with self.lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.executemany(
+                    "INSERT INTO state (namespace, scope, key, value) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (namespace, scope, key) DO UPDATE SET value = excluded.value",
+                    upserts
+                )
+                self.connection.executemany(
+                    "DELETE FROM state WHERE namespace = ? AND scope = ? AND key = ?",
+                    deletes
+                )
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        
+        self.stats['flushes'] += 1
+        self.stats['rows_written'] += len(batch)
+        self.stats['bytes_written'] += sum(len(row[3]) for row in upserts)
+    
+    async def flush(self):
+        """Write queued changes off the event loop"""
+        batch = self.take_pending()
+        if not batch:
+            return
+        await asyncio.to_thread(self.write_batch, batch)
+        self.unwritten = {}
+
+storage = BotStorage(DATABASE_PATH)
+
+def load_state():
+    """Restore persisted global state; guild state is loaded on first use"""
+    start = time.perf_counter()
+    storage.open()
+    
+    for message_id, mappings in storage.load('reaction_roles').items():
+        reaction_roles[message_id] = canonical_reaction_mappings(mappings)
+    # Snowflakes grow over time, so sorting by message ID puts the oldest first for eviction
+    embed_storage.update(sorted(storage.load('embed_storage').items()))
+    evict_sent_embeds()
+    auction_settings.update(storage.load('auction_settings'))
+    
+    print(f"Loaded persisted state from {storage.path} in {time.perf_counter() - start:.2f}s")
+
+class GuildState:
+    """Settings and tracking data that belong to a single guild"""
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.command_permissions = {command_name: [] for command_name in COMMAND_NAMES}  # command_name: [role_ids]
+        self.admin_roles = []
+        self.moderator_roles = []
+        self.admin_role_ids = frozenset()
+        self.command_role_ids = {}  # command_name: frozenset of role_ids
+        self.permission_cache = OrderedDict()  # (roles signature, command_name): allowed, least recently used first
+        self.autoresponders = {}  # trigger: data
+        self.trigger_matcher = TriggerEngine()
+        self.autoresponder_role_ids = {}  # trigger: frozenset of role_ids, only for role-restricted triggers
+        self.prepared_responses = {}  # trigger: AutoresponderResponse
+        self.trigger_index = []  # every trigger, sorted for paging and prefix lookups
+        self.trigger_stats = {}  # trigger: [matched, cooldown suppressed, role suppressed, sent]
+        self.dirty_trigger_stats = set()  # triggers whose counters changed since the last save
+        self.messages_evaluated = 0
+        self.saved_evaluated = 0
+        self.match_latency = [0] * LATENCY_BUCKETS  # bucket i counts match stages under 2**i microseconds
+        self.cooldowns = CooldownBuckets()
+        self.autoresponder_channels = {'allow': [], 'deny': []}  # channel_ids; an empty allow list means every channel
+        self.channel_allow = frozenset()
+        self.channel_deny = frozenset()
+        self.boost_roles = {}  # boost_count: role_id
+        self.boost_ladder = RoleLadder({})
+        self.boost_tracking = {}  # user_id: {'boosts': count, 'boost_history': [], 'current_boost_start': timestamp}
+        self.invite_roles = {}  # invite_count: role_id
+        self.invite_ladder = RoleLadder({})
+        self.invite_tracking = {}  # user_id: {'invites': count, 'invited_users': []}
+        self.invitee_index = {}  # invitee_id: (inviter_id, invited_users entry) for members still in the guild
+        self.invite_cache = {}  # invite_code: {'uses': count, 'inviter_id': user_id, 'max_uses': limit}
+        self.embed_templates = {}  # name: embed dict, validated when saved
+        self.template_payloads = {}  # name: send() kwargs built once and shared by every send
+        self.vanity_uses = None
+        self.pending_joins = []  # members waiting for the next invite fetch
+        self.unclaimed_invite_uses = []  # (inviter_id, seen_at) of uses seen before their join event arrived
+        self.invite_refresh = None  # task that attributes pending_joins
+    
+    def load(self):
+        """Read this guild's rows from storage"""
+        config = storage.load('bot_config', self.guild_id)
+        self.command_permissions.update(config.get('command_permissions', {}))
+        self.admin_roles = config.get('admin_roles', [])
+        self.moderator_roles = config.get('moderator_roles', [])
+        self.autoresponder_channels = config.get('autoresponder_channels', self.autoresponder_channels)
+        self.rebuild_permissions()
+        self.rebuild_channel_filters()
+        
+        self.autoresponders = storage.load('autoresponders', self.guild_id)
+        self.trigger_stats = storage.load('autoresponder_stats', self.guild_id)
+        totals = storage.load('autoresponder_totals', self.guild_id)
+        self.messages_evaluated = self.saved_evaluated = totals.get('evaluated', 0)
+        self.match_latency = (totals.get('match_latency', []) + [0] * LATENCY_BUCKETS)[:LATENCY_BUCKETS]
+        self.disable_unsafe_regexes()
+        self.rebuild_trigger_matcher()
+        
+        self.boost_roles = storage.load('boost_roles', self.guild_id)
+        self.boost_tracking = storage.load('boost_tracking', self.guild_id)
+        self.invite_roles = storage.load('invite_roles', self.guild_id)
+        self.invite_tracking = storage.load('invite_tracking', self.guild_id)
+        self.rebuild_invitee_index()
+        self.rebuild_role_ladders()
+        
+        self.embed_templates = storage.load('embed_templates', self.guild_id)
+        self.template_payloads = {name: {'embed': discord.Embed.from_dict(data)} for name, data in self.embed_templates.items()}
+    
+    def persist(self, namespace, key, value):
+        """Queue a write of one of this guild's rows"""
+        storage.put(namespace, key, value, scope=self.guild_id)
+    
+    def forget(self, namespace, key):
+        """Queue deletion of one of this guild's rows"""
+        storage.delete(namespace, key, scope=self.guild_id)
+    
+    def save_embed_template(self, name, data):
+        self.embed_templates[name] = data
+        self.template_payloads[name] = {'embed': discord.Embed.from_dict(data)}
+        self.persist('embed_templates', name, data)
+    
+    def delete_embed_template(self, name):
+        del self.embed_templates[name]
+        del self.template_payloads[name]
+        self.forget('embed_templates', name)
+    
+    def rebuild_trigger_matcher(self):
+        """Recompile the trigger matcher and role filters after the autoresponder set changes"""
+        self.trigger_matcher = TriggerEngine(trigger for trigger, data in self.autoresponders.items() if not data.get('disabled'))
+        self.prepared_responses = {trigger: AutoresponderResponse(data) for trigger, data in self.autoresponders.items()}
+        self.trigger_index = sorted(self.autoresponders)
+        for trigger in [trigger for trigger in self.trigger_stats if trigger not in self.autoresponders]:
+            del self.trigger_stats[trigger]
+            self.dirty_trigger_stats.discard(trigger)
+            self.forget('autoresponder_stats', trigger)
+        self.compile_autoresponder_roles()
+    
+    def count_trigger(self, trigger, counter):
+        """Bump one of a trigger's counters: 0 matched, 1 cooldown suppressed, 2 role suppressed, 3 sent"""
+        stats = self.trigger_stats.get(trigger)
+        if stats is None:
+            stats = self.trigger_stats[trigger] = [0, 0, 0, 0]
+        stats[counter] += 1
+        self.dirty_trigger_stats.add(trigger)
+    
+    def record_match_latency(self, seconds):
+        self.messages_evaluated += 1
+        self.match_latency[min(int(seconds * 1_000_000).bit_length(), LATENCY_BUCKETS - 1)] += 1
+    
+    def latency_percentile(self, percentile):
+        """Upper bound in microseconds of the histogram bucket holding the given percentile"""
+        total = sum(self.match_latency)
+        if not total:
+            return 0
+        running = 0
+        for bucket, count in enumerate(self.match_latency):
+            running += count
+            if running * 100 >= total * percentile:
+                return 2 ** bucket
+        return 2 ** (LATENCY_BUCKETS - 1)
+    
+    def persist_trigger_stats(self):
+        """Queue changed counters for the next storage batch"""
+        for trigger in self.dirty_trigger_stats:
+            self.persist('autoresponder_stats', trigger, self.trigger_stats[trigger])
+        self.dirty_trigger_stats.clear()
+        if self.messages_evaluated != self.saved_evaluated:
+            self.saved_evaluated = self.messages_evaluated
+            self.persist('autoresponder_totals', 'evaluated', self.messages_evaluated)
+            self.persist('autoresponder_totals', 'match_latency', self.match_latency)
+    
+    def triggers_with_prefix(self, prefix, limit=25):
+        """Triggers starting with prefix, found by bisecting the sorted index"""
+        index = self.trigger_index
+        start = bisect.bisect_left(index, prefix)
+        matches = []
+        for trigger in index[start:start + limit]:
+            if not trigger.startswith(prefix):
+                break
+            matches.append(trigger)
+        return matches
+    
+    def disable_unsafe_regexes(self):
+        """Turn off saved regex triggers that the current regex_problem rules would reject"""
+        for trigger, data in self.autoresponders.items():
+            mode, pattern = parse_trigger(trigger)
+            if mode == 'regex' and not data.get('disabled') and regex_problem(pattern):
+                data['disabled'] = True
+                self.persist('autoresponders', trigger, data)
+                print(f"Disabled unsafe regex autoresponder trigger in guild {self.guild_id}: {trigger}")
+    
+    def disable_slow_rules(self, engine):
+        """Turn off regex triggers that ran past REGEX_TIMEOUT in engine"""
+        slow, engine.slow = [trigger for trigger in engine.slow if trigger in self.autoresponders], []
+        for trigger in slow:
+            self.autoresponders[trigger]['disabled'] = True
+            self.persist('autoresponders', trigger, self.autoresponders[trigger])
+            print(f"Disabled slow autoresponder trigger in guild {self.guild_id}: {trigger}")
+        if slow:
+            self.rebuild_trigger_matcher()
+    
+    def rebuild_channel_filters(self):
+        """Recompile the autoresponder channel allow and deny sets"""
+        self.channel_allow = frozenset(self.autoresponder_channels['allow'])
+        self.channel_deny = frozenset(self.autoresponder_channels['deny'])
+    
+    def compile_autoresponder_roles(self):
+        """Build the role ID set each restricted autoresponder checks against"""
+        self.autoresponder_role_ids = {}
+        for trigger, data in self.autoresponders.items():
+            # Restricted but unresolved means nobody matches, never everybody
+            if data['allowed_roles']:
+                self.autoresponder_role_ids[trigger] = frozenset(data['allowed_role_ids'])
+    
+    def autoresponder_allowed(self, trigger, member):
+        """Check the autoresponder's role filter against the member's role IDs"""
+        role_ids = self.autoresponder_role_ids.get(trigger)
+        return role_ids is None or not role_ids.isdisjoint(member._roles)
+    
+    def rebuild_permissions(self):
+        """Recompile permission role sets after admin or command roles change"""
+        self.admin_role_ids = frozenset(self.admin_roles)
+        self.command_role_ids = {command_name: frozenset(role_ids) for command_name, role_ids in self.command_permissions.items()}
+        self.permission_cache.clear()
+    
+    def has_permission(self, member, command_name):
+        """Check if member may use a command, memoized per role set"""
+        if member.id == member.guild.owner_id:
+            return True
+        
+        # SnowflakeList keeps role IDs sorted, so members with the same roles share a signature
+        key = (tuple(member._roles), command_name)
+        allowed = self.permission_cache.get(key)
+        if allowed is not None:
+            self.permission_cache.move_to_end(key)
+        else:
+            role_ids = frozenset(member._roles)
+            allowed = (
+                # Admin roles bypass all restrictions
+                not self.admin_role_ids.isdisjoint(role_ids)
+                # Administrator permission is the default requirement
+                or member.guild_permissions.administrator
+                # An empty role set means Administrator is required
+                or not self.command_role_ids.get(command_name, frozenset()).isdisjoint(role_ids)
+            )
+            self.permission_cache[key] = allowed
+            if len(self.permission_cache) > PERMISSION_CACHE_SIZE:
+                self.permission_cache.popitem(last=False)
+        return allowed
+    
+    def rebuild_role_ladders(self):
+        """Recompile the boost and invite ladders after their role maps change"""
+        self.boost_ladder = RoleLadder(self.boost_roles)
+        self.invite_ladder = RoleLadder(self.invite_roles)
+    
+    def rebuild_invitee_index(self):
+        """Rebuild the invitee -> inviter index from the tracked invite history"""
+        self.invitee_index = {}
+        for inviter_id, data in self.invite_tracking.items():
+            for invited_user in data['invited_users']:
+                if 'left_at' in invited_user:
+                    continue
+                # If someone shows up twice without leaving, the most recent join wins
+                current = self.invitee_index.get(invited_user['user_id'])
+                if current is None or invited_user['joined_at'] >= current[1]['joined_at']:
+                    self.invitee_index[invited_user['user_id']] = (inviter_id, invited_user)
+
+def get_guild_state(guild_id):
+    """Return the state for a guild, loading it from storage the first time it is used"""
+    state = guild_states.get(guild_id)
+    if state is None:
+        state = GuildState(guild_id)
+        state.load()
+        guild_states[guild_id] = state
+    return state
+
 class Connect4Game:
     def __init__(self, player1, player2, channel):
         self.player1 = player1
@@ -180,30 +584,112 @@ class Connect4Game:
         self.current_player = self.player2 if self.current_player == self.player1 else self.player1
         return None
 
-def has_permission(user_roles, command_name, user):
-    """Check if user has permission to use a command"""
-    # Admin roles bypass all restrictions
-    if bot_config['admin_roles']:
-        user_role_ids = [role.id for role in user_roles]
-        if any(role_id in user_role_ids for role_id in bot_config['admin_roles']):
-            return True
-    
-    # Check if user has Administrator permission (default requirement)
-    if user.guild_permissions.administrator:
+class MissingCommandPermission(app_commands.CheckFailure):
+    """Raised by require_permission when a member can't use a command"""
+    pass
+
+def require_permission(command_name):
+    """Decorator to restrict a command to admins and the roles configured for it"""
+    def predicate(interaction: discord.Interaction) -> bool:
+        if interaction.guild is None or not get_guild_state(interaction.guild_id).has_permission(interaction.user, command_name):
+            raise MissingCommandPermission(f"Missing permission for {command_name}")
         return True
-    
-    # Check command-specific permissions
-    if command_name in bot_config['command_permissions']:
-        allowed_roles = bot_config['command_permissions'][command_name]
-        if not allowed_roles:
-            # Empty list means Administrator permission required
+    return app_commands.check(predicate)
+
+def roles_by_name(guild):
+    roles = {}
+    for role in guild.roles:
+        roles.setdefault(role.name, []).append(role.id)
+    return roles
+
+def resolve_roles(guild, entries, names=None):
+    """Resolve role names, IDs or mentions to role IDs, returning (role_ids, unknown entries)"""
+    names = names if names is not None else roles_by_name(guild)
+    
+    role_ids = []
+    unknown = []
+    for entry in entries:
+        entry = entry.strip()
+        role_id = entry.removeprefix('<@&').removesuffix('>')
+        if role_id.isdigit() and guild.get_role(int(role_id)):
+            role_ids.append(int(role_id))
+        elif entry in names:
+            role_ids.extend(names[entry])
+        else:
+            unknown.append(entry)
+    return list(dict.fromkeys(role_ids)), unknown
+
+def reaction_emoji_key(guild, value):
+    """Canonical reaction role key for typed emoji: a custom emoji's ID or a unicode emoji's text, None if unknown"""
+    value = value.strip()
+    if value.isdigit():
+        return int(value) if bot.get_emoji(int(value)) else None
+    if len(value) > 2 and value.startswith(':') and value.endswith(':'):
+        emoji = discord.utils.get(guild.emojis, name=value[1:-1])
+        return emoji.id if emoji else None
+    partial = discord.PartialEmoji.from_str(value)
+    if partial.id:
+        return partial.id
+    return partial.name if is_unicode_emoji(partial.name) else None
+
+EMOJI_JOINERS = frozenset('\u200d\ufe0e\ufe0f0123456789#*')  # ZWJ, variation selectors and keycap bases
+# Emoji whose base character Unicode files as a letter, math symbol or punctuation rather than So
+EMOJI_NON_SYMBOLS = frozenset('\u2139\u2194\u25fb\u25fc\u25fd\u25fe\u2934\u2935\u203c\u2049\u3030\u303d')  # ℹ ↔ ◻ ◼ ◽ ◾ ⤴ ⤵ ‼ ⁉ 〰 〽
+
+def is_unicode_emoji(value):
+    """Whether text is made only of emoji characters, so Discord would accept it as a reaction"""
+    has_symbol = False
+    for char in value:
+        category = unicodedata.category(char)
+        if category in ('So', 'Me') or char in EMOJI_NON_SYMBOLS:
+            has_symbol = True
+        elif category != 'Sk' and char not in EMOJI_JOINERS and not 0xE0020 <= ord(char) <= 0xE007F:
             return False
-        
-        user_role_ids = [role.id for role in user_roles]
-        return any(role_id in user_role_ids for role_id in allowed_roles)
-    
-    # Default: require Administrator
-    return False
+    return has_symbol
+
+def reaction_emoji(key):
+    """The emoji to react with or display for a reaction role key, None if the custom emoji is gone"""
+    return bot.get_emoji(key) if isinstance(key, int) else key
+
+def canonical_reaction_mappings(config):
+    """Restore the custom emoji ID keys that JSON turned into strings"""
+    config['roles'] = {int(key) if key.isdigit() else key: role_id for key, role_id in config['roles'].items()}
+    return config
+
+REACTION_ROLE_MODES = {  # mode: how it reads in panels
+    'toggle': 'reacting toggles the role, removing the reaction removes it',
+    'unique': 'one role from the message at a time',
+    'verify': 'roles are only ever added',
+    'max': 'at most N roles from the message',
+}
+
+def parse_reaction_mode(value):
+    """Parse "toggle", "unique", "verify" or "max:N" into (mode, limit), raising ValueError"""
+    mode, _, limit = value.strip().lower().partition(':')
+    if mode not in REACTION_ROLE_MODES:
+        raise ValueError(f"Mode must be one of: {', '.join(REACTION_ROLE_MODES)}")
+    if mode != 'max':
+        return mode, 0
+    if not limit.strip().isdigit() or int(limit) < 1:
+        raise ValueError("Max mode needs a limit, like max:2")
+    return mode, int(limit)
+
+def apply_reaction_event(roles, config, role_id, added):
+    """Update a member's role set in place for one reaction under the message's mode"""
+    mode = config['mode']
+    if not added:
+        if mode != 'verify':
+            roles.discard(role_id)
+    elif mode == 'toggle':
+        roles ^= {role_id}
+    elif mode == 'unique':
+        roles.difference_update(config['roles'].values())
+        roles.add(role_id)
+    elif mode == 'max':
+        if role_id in roles or len(roles.intersection(config['roles'].values())) < config['limit']:
+            roles.add(role_id)
+    else:  # verify
+        roles.add(role_id)
 
 def guild_only():
     """Decorator to restrict commands to allowed guilds"""
@@ -213,6 +699,896 @@ def guild_only():
         return interaction.guild_id in ALLOWED_GUILD_IDS
     return app_commands.check(predicate)
 
+class TriggerMatcher:
+    """Aho-Corasick automaton that finds every autoresponder trigger in one pass"""
+    # Below this many triggers a plain `in` scan is faster than walking the automaton
+    LINEAR_SCAN_LIMIT = 128
+    
+    def __init__(self, triggers=()):
+        self.triggers = list(triggers)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        
+        if len(self.triggers) >= self.LINEAR_SCAN_LIMIT:
+            self.build()
+    
+    def build(self):
+        """Build the trie, failure links and merged outputs"""
+        outputs = [set()]
+        for index, trigger in enumerate(self.triggers):
+            state = 0
+            for char in trigger:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    outputs.append(set())
+                state = next_state
+            outputs[state].add(index)
+        
+        # Breadth-first so every failure target is resolved before its children
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                outputs[next_state] |= outputs[self.fail[next_state]]
+        
+        self.output = [tuple(sorted(indexes)) for indexes in outputs]
+    
+    def find_all(self, text):
+        """Return every trigger contained in text, in autoresponder order"""
+        if len(self.triggers) < self.LINEAR_SCAN_LIMIT:
+            return [trigger for trigger in self.triggers if trigger in text]
+        
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        found = set(output[0])
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        
+        return [self.triggers[index] for index in sorted(found)]
+
+ZERO_WIDTH_CHARS = dict.fromkeys(map(ord, '\u00ad\u180e\u200b\u200c\u200d\u2060\ufeff'))
+CUSTOM_EMOJI = re.compile(r'<a?:(\w+):\d+>')
+LINE_MARKUP = re.compile(r'^(?:>>> |> |#{1,3} |-# )', re.MULTILINE)
+MARKDOWN_CHARS = re.compile(r'\\?[*_~|`]')
+
+def strip_markup(text):
+    """Reduce custom emoji to :name: and drop markdown formatting"""
+    # Plain `in` checks cost far less than running a substitution over text with no markup
+    if '<' in text:
+        text = CUSTOM_EMOJI.sub(r':\1:', text)
+    if '>' in text or '#' in text:
+        text = LINE_MARKUP.sub('', text)
+    if '*' in text or '_' in text or '~' in text or '|' in text or '`' in text:
+        text = MARKDOWN_CHARS.sub('', text)
+    return text
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_unicode_text(text):
+    text = unicodedata.normalize('NFKC', text).translate(ZERO_WIDTH_CHARS)
+    return unicodedata.normalize('NFKC', strip_markup(text).casefold())
+
+def normalize_text(text):
+    """Fold text for matching: NFKC, casefold, no zero-width characters, markdown or emoji IDs"""
+    # ASCII text has nothing for NFKC or casefold to change, so it skips unicodedata entirely
+    if text.isascii():
+        return strip_markup(text).lower()
+    return normalize_unicode_text(text)
+
+TRIGGER_MODES = ('exact', 'word', 'prefix', 'glob', 'regex')  # written as "mode:pattern"; plain triggers match substrings
+
+def parse_trigger(trigger):
+    """Split a stored trigger into (mode, pattern)"""
+    mode, separator, pattern = trigger.partition(':')
+    if separator and mode in TRIGGER_MODES:
+        return mode, pattern
+    return 'substring', trigger
+
+def normalize_pattern(mode, pattern):
+    """Fold a trigger pattern like message text; regex patterns stay as written so \\S, \\W etc. keep their meaning"""
+    if mode == 'regex':
+        return pattern
+    if mode == 'glob':
+        return ''.join(part if part in ('*', '?') else normalize_text(part) for part in re.split(r'([*?])', pattern))
+    return normalize_text(pattern)
+
+def normalize_trigger(value):
+    """Normalize a trigger as typed into the form it is stored under"""
+    mode, separator, pattern = value.partition(':')
+    mode = mode.strip().lower()
+    if separator and mode in TRIGGER_MODES:
+        return f"{mode}:{normalize_pattern(mode, pattern.strip())}"
+    return normalize_text(value)
+
+def compile_trigger_pattern(mode, pattern):
+    """Compile the regex a word, glob or regex trigger is checked with"""
+    if mode == 'word':
+        return re.compile(f"(?<!\\w){re.escape(pattern)}(?!\\w)")
+    if mode == 'glob':
+        return GlobPattern(pattern)
+    return re.compile(pattern, re.IGNORECASE)
+
+class GlobPattern:
+    """Whole-message glob with * and ? wildcards, matched in one left-to-right pass instead of a backtracking regex"""
+    def __init__(self, pattern):
+        self.pieces = pattern.split('*')
+    
+    @staticmethod
+    def find(piece, text, start, end):
+        """Leftmost index from start where piece fits before end, ? matching any character, or -1"""
+        if '?' not in piece:
+            return text.find(piece, start, end)
+        for position in range(start, end - len(piece) + 1):
+            if all(wanted == '?' or wanted == char for wanted, char in zip(piece, text[position:position + len(piece)])):
+                return position
+        return -1
+    
+    def match(self, text):
+        """Check text with surrounding whitespace already stripped"""
+        first, *middle = self.pieces
+        if not middle:
+            return len(text) == len(first) and self.find(first, text, 0, len(text)) == 0
+        
+        last = middle.pop()
+        end = len(text) - len(last)
+        if end < len(first) or self.find(first, text, 0, len(first)) != 0 or self.find(last, text, end, len(text)) != end:
+            return False
+        
+        # Taking the leftmost fit for each piece never rules out a match a later fit would allow
+        position = len(first)
+        for piece in middle:
+            position = self.find(piece, text, position, end)
+            if position < 0:
+                return False
+            position += len(piece)
+        return True
+
+REGEX_SAMPLE_CHARS = [chr(code) for code in range(0x250)] + ['\u00a0', '\u2003', '\u0436', '\u4e2d', '\U0001f600']
+
+def regex_item_chars(parsed, items):
+    """Sample characters any single-character item inside items can match"""
+    chars = set()
+    for op, av in items:
+        if op in (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.ANY, sre_constants.IN):
+            matcher = sre_compile.compile(sre_parse.SubPattern(parsed.state, [(op, av)]), re.IGNORECASE)
+            chars.update(char for char in REGEX_SAMPLE_CHARS if matcher.fullmatch(char))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) or op == getattr(sre_constants, 'POSSESSIVE_REPEAT', None):
+            chars |= regex_item_chars(parsed, av[2])
+        elif op == sre_constants.SUBPATTERN:
+            chars |= regex_item_chars(parsed, av[-1])
+        elif op == sre_constants.BRANCH:
+            for branch in av[1]:
+                chars |= regex_item_chars(parsed, branch)
+    return chars
+
+def regex_problem(pattern):
+    """Describe why a regex trigger is unsafe or unsupported, or return None"""
+    if len(pattern) > REGEX_MAX_LENGTH:
+        return f"Regex triggers are limited to {REGEX_MAX_LENGTH} characters."
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error as e:
+        return f"Invalid regex: {e}"
+    
+    repeats = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+    if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+        repeats.add(sre_constants.POSSESSIVE_REPEAT)
+    open_repeats = []  # character samples of every repeat that can run long
+    choices = 1  # ways the short optional parts and alternations can split one message
+    
+    def open_repeat(item):
+        """The item's repeat body if it is a long repeat, looking through a wrapping group"""
+        op, av = item
+        if op == sre_constants.SUBPATTERN and len(av[-1]) == 1:
+            op, av = av[-1][0]
+        # A large bounded repeat backtracks like an unbounded one
+        if op in repeats and (av[1] == sre_constants.MAXREPEAT or av[1] > 15):
+            return av[2]
+        return None
+    
+    def walk(items, multiplier):
+        """Check items repeated up to multiplier times by the repeats around them"""
+        nonlocal choices
+        previous = None
+        for op, av in items:
+            body = open_repeat((op, av))
+            chars = regex_item_chars(parsed, body) if body is not None else None
+            if previous and chars and previous & chars:
+                return "Adjacent repeats that can match the same text, like .*.*, take polynomial time."
+            previous = chars
+            
+            if op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+                return "Backreferences aren't supported in regex triggers."
+            if op in repeats:
+                min_count, max_count, item = av
+                unbounded = max_count == sre_constants.MAXREPEAT or max_count > 15
+                # Under another repeat, any choice of length can be split between iterations in exponentially many ways
+                if multiplier > 1 and (unbounded or min_count != max_count):
+                    return "Repeats inside repeats like (a+)+ or (a{1,15}){1,15} can take exponential time."
+                if multiplier > 1 and multiplier * max_count > REGEX_NESTED_REPEAT_LIMIT:
+                    return f"Nested repeats like (ab{{3}}){{50}} are limited to {REGEX_NESTED_REPEAT_LIMIT} repetitions in total."
+                if unbounded:
+                    open_repeats.append(regex_item_chars(parsed, item))
+                else:
+                    choices *= max_count - min_count + 1
+                problem = walk(item, multiplier * max_count)
+            elif op == sre_constants.SUBPATTERN:
+                problem = walk(av[-1], multiplier)
+            elif op == sre_constants.BRANCH:
+                if multiplier > 1:
+                    return "Alternation inside a repeat like (a|aa)* can take exponential time; use a character class instead."
+                choices *= len(av[1])
+                problem = next(filter(None, (walk(item, multiplier) for item in av[1])), None)
+            elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+                problem = walk(av[1], multiplier)
+            elif op == getattr(sre_constants, 'ATOMIC_GROUP', None):
+                problem = walk(av, multiplier)
+            else:
+                continue
+            if problem:
+                return problem
+        return None
+    
+    problem = walk(parsed, 1)
+    if problem:
+        return problem
+    if choices > REGEX_CHOICE_LIMIT:
+        return "Too many optional parts or alternatives; patterns like a?a?a?a?aaaa get exponentially slow."
+    
+    # Each extra repeat that can take the same characters multiplies the backtracking by the message length
+    for char in REGEX_SAMPLE_CHARS:
+        if sum(char in chars for chars in open_repeats) > 2:
+            return "More than two repeats that can match the same text, like .*a.*a.*b, get slow on long messages."
+    return None
+
+def trigger_problem(trigger):
+    """Validate a normalized trigger before it is saved, returning an error message or None"""
+    mode, pattern = parse_trigger(trigger)
+    if not pattern:
+        return "Trigger can't be empty."
+    if mode == 'regex':
+        problem = regex_problem(pattern)
+        if problem:
+            return problem
+    if mode in ('word', 'glob', 'regex'):
+        try:
+            compile_trigger_pattern(mode, pattern)
+        except re.error as e:
+            return f"Invalid {mode} trigger: {e}"
+    return None
+
+def trigger_min_length(mode, pattern):
+    """Shortest message text a trigger could match"""
+    if mode == 'regex':
+        return sre_parse.parse(pattern).getwidth()[0]
+    if mode == 'glob':
+        return sum(char != '*' for char in pattern)
+    return len(pattern)
+
+class TriggerEngine:
+    """Dispatches each trigger mode to its cheapest check and merges matches in autoresponder order"""
+    def __init__(self, triggers=()):
+        self.order = {trigger: index for index, trigger in enumerate(triggers)}
+        self.literals = {}  # text fed to the Aho-Corasick matcher: substring and word triggers using it
+        self.exact = {}  # whole message: trigger
+        self.prefixes = {}  # length: {prefix: [triggers]}
+        self.word_patterns = {}  # trigger: boundary check run once its text is found
+        self.globs = []  # (trigger, GlobPattern)
+        self.patterns = []  # (trigger, pattern) for regex triggers, run by regex_worker
+        self.slow = []  # regex triggers that ran past REGEX_TIMEOUT
+        self.min_length = 0  # messages shorter than this can't match anything
+        
+        lengths = []
+        for trigger in self.order:
+            mode, pattern = parse_trigger(trigger)
+            lengths.append(trigger_min_length(mode, pattern))
+            if mode in ('substring', 'word'):
+                self.literals.setdefault(pattern, []).append(trigger)
+                if mode == 'word':
+                    self.word_patterns[trigger] = compile_trigger_pattern(mode, pattern)
+            elif mode == 'exact':
+                self.exact.setdefault(pattern, []).append(trigger)
+            elif mode == 'prefix':
+                self.prefixes.setdefault(len(pattern), {}).setdefault(pattern, []).append(trigger)
+            elif mode == 'glob':
+                self.globs.append((trigger, compile_trigger_pattern(mode, pattern)))
+            else:
+                self.patterns.append((trigger, pattern))
+        
+        self.matcher = TriggerMatcher(self.literals)
+        if lengths:
+            self.min_length = min(lengths)
+    
+    def find_all(self, text):
+        """Return every trigger matching text, in autoresponder order"""
+        found = []
+        for literal in self.matcher.find_all(text):
+            for trigger in self.literals[literal]:
+                word_pattern = self.word_patterns.get(trigger)
+                if word_pattern is None or word_pattern.search(text):
+                    found.append(trigger)
+        
+        stripped = text.strip()
+        found.extend(self.exact.get(stripped, ()))
+        for length, prefixes in self.prefixes.items():
+            found.extend(prefixes.get(stripped[:length], ()))
+        
+        for trigger, glob in self.globs:
+            if glob.match(stripped):
+                found.append(trigger)
+        
+        if len(found) > 1:
+            found.sort(key=self.order.__getitem__)
+        return found
+    
+    async def find_all_with_patterns(self, text):
+        """find_all plus the regex triggers, which run in regex_worker so a runaway pattern can't block the event loop"""
+        found = self.find_all(text)
+        if not self.patterns:
+            return found
+        
+        matched, slow = await regex_worker.search([pattern for _, pattern in self.patterns], text[:REGEX_TEXT_LIMIT])
+        found.extend(self.patterns[index][0] for index in matched)
+        if slow is not None:
+            self.slow.append(self.patterns[slow][0])
+        if len(found) > 1:
+            found.sort(key=self.order.__getitem__)
+        return found
+
+def regex_worker_loop(connection, running):
+    """Child process body: answer (patterns, text) requests with the indexes of the patterns that match"""
+    compiled = {}
+    while True:
+        try:
+            patterns, text = connection.recv()
+        except EOFError:
+            return
+        matched = []
+        for index, pattern in enumerate(patterns):
+            running.value = index  # read by the parent to find the culprit if this search never returns
+            regex = compiled.get(pattern)
+            if regex is None:
+                try:
+                    regex = compiled[pattern] = re.compile(pattern, re.IGNORECASE)
+                except re.error:
+                    continue
+            if regex.search(text):
+                matched.append(index)
+        connection.send(matched)
+
+class RegexWorker:
+    """Runs regex triggers in a child process, since Python's re can't be interrupted but a process can be killed"""
+    def __init__(self):
+        self.process = None
+        self.connection = None
+        self.running = None
+        self.lock = asyncio.Lock()
+    
+    def start(self):
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.running = multiprocessing.Value('i', -1, lock=False)
+        self.process = multiprocessing.Process(target=regex_worker_loop, args=(child_connection, self.running), daemon=True)
+        self.process.start()
+        child_connection.close()
+    
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.connection.close()
+            self.process = None
+    
+    async def search(self, patterns, text):
+        """Return (indexes of matching patterns, index of the pattern that timed out or None)"""
+        async with self.lock:
+            if self.process is None or not self.process.is_alive():
+                self.start()
+            self.running.value = -1
+            self.connection.send((patterns, text))
+            ready = await asyncio.get_running_loop().run_in_executor(None, self.connection.poll, REGEX_TIMEOUT)
+            if ready:
+                try:
+                    return self.connection.recv(), None
+                except EOFError:
+                    self.stop()  # the worker died on its own; the next message starts a new one
+                    return [], None
+            
+            slow = self.running.value
+            self.stop()
+            return [], slow if slow >= 0 else None
+
+regex_worker = RegexWorker()
+
+COOLDOWN_SCOPES = {  # scope: how it reads in panels
+    'global': '',
+    'guild': ' per server',
+    'channel': ' per channel',
+    'user': ' per user',
+    'member_channel': ' per member per channel',
+}
+
+def parse_cooldown(value):
+    """Parse "30", "30 user" or "30 member+channel" into (seconds, scope), raising ValueError"""
+    parts = value.lower().replace('+', '_').split()
+    if not parts or len(parts) > 2:
+        raise ValueError(value)
+    seconds = int(parts[0])
+    scope = parts[1] if len(parts) > 1 else 'global'
+    if seconds < 0 or scope not in COOLDOWN_SCOPES:
+        raise ValueError(value)
+    return seconds, scope
+
+def format_cooldown(data):
+    return f"{data['cooldown']}s{COOLDOWN_SCOPES[data.get('cooldown_scope', 'global')]}"
+
+def cooldown_key(trigger, scope, message):
+    """Bucket a message falls into for a trigger's cooldown"""
+    if scope == 'channel':
+        return (trigger, message.channel.id)
+    if scope == 'user':
+        return (trigger, message.author.id)
+    if scope == 'member_channel':
+        return (trigger, message.author.id, message.channel.id)
+    # Autoresponders already belong to one guild, so global and guild share a bucket
+    return trigger
+
+class CooldownBuckets:
+    """Active cooldowns keyed by bucket, with a heap so expired buckets are dropped in order"""
+    def __init__(self):
+        self.expires = {}  # bucket key: monotonic expiry time
+        self.heap = []  # (expiry, bucket key)
+    
+    def active(self, key, now):
+        expiry = self.expires.get(key)
+        return expiry is not None and expiry > now
+    
+    def start(self, key, seconds, now):
+        if seconds <= 0:
+            return
+        
+        # Only keys past their expiry are popped, so memory tracks buckets still cooling down
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            expiry, expired_key = heapq.heappop(heap)
+            if self.expires.get(expired_key) == expiry:
+                del self.expires[expired_key]
+        
+        expiry = now + seconds
+        self.expires[key] = expiry
+        heapq.heappush(heap, (expiry, key))
+
+TEMPLATE_VARIABLE = re.compile(r'\{(user|channel|count)\}')
+
+class ResponseTemplate:
+    """Response text split once into literal and variable segments; unknown braces stay literal"""
+    def __init__(self, text):
+        self.text = text
+        # re.split with a group alternates literal text and variable names
+        self.segments = TEMPLATE_VARIABLE.split(text)
+        self.variables = frozenset(self.segments[1::2])
+    
+    def render(self, values):
+        if not self.variables:
+            return self.text
+        return ''.join(values[segment] if index % 2 else segment for index, segment in enumerate(self.segments))
+
+class AutoresponderResponse:
+    """Outgoing payload for one autoresponder, built when it is saved rather than on every reply"""
+    def __init__(self, data):
+        self.is_embed = bool(data['is_embed'] and data['embed_title'])
+        self.title = ResponseTemplate(data['embed_title'] if self.is_embed else '')
+        self.body = ResponseTemplate(data['response'])
+        self.uses_count = 'count' in self.title.variables or 'count' in self.body.variables
+        
+        # Without variables every reply is identical, so one payload (and one Embed) is shared
+        self.static_payload = None
+        if not self.title.variables and not self.body.variables:
+            self.static_payload = self.build_payload(self.title.text, self.body.text)
+    
+    def build_payload(self, title, body):
+        if self.is_embed:
+            return {'embed': discord.Embed(title=title, description=body, color=0x0099ff)}
+        return {'content': body}
+    
+    def render(self, user, channel, count):
+        """Return (title, body) with {user}, {channel} and {count} filled in"""
+        values = {'user': user.mention, 'channel': f"<#{channel.id}>", 'count': str(count)}
+        return self.title.render(values), self.body.render(values)
+    
+    def keyed_payload(self, trigger, user, channel, count):
+        """Return (send() kwargs, dedupe key); only replies with identical text share a key"""
+        if self.static_payload is not None:
+            return self.static_payload, trigger
+        title, body = self.render(user, channel, count)
+        return self.build_payload(title, body), (trigger, title, body)
+
+class RoleLadder:
+    """Threshold -> role mapping with the thresholds pre-sorted for bisect lookups"""
+    def __init__(self, roles):
+        ranked = sorted(roles.items())
+        self.thresholds = [threshold for threshold, _ in ranked]
+        self.ranked_role_ids = [role_id for _, role_id in ranked]
+        self.role_ids = frozenset(self.ranked_role_ids)
+    
+    def target_role(self, count, guild):
+        """Return the highest existing role earned at count, or None"""
+        index = bisect.bisect_right(self.thresholds, count)
+        while index:
+            index -= 1
+            role_id = self.ranked_role_ids[index]
+            if guild.get_role(role_id):
+                return role_id
+        return None
+
+class MemberCache:
+    """Small TTL LRU of members for low memory mode; a size of 0 keeps nothing"""
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.members = OrderedDict()  # (guild_id, member_id): (member, cached_at)
+        self.stats = {'hits': 0, 'fetches': 0}
+    
+    def remember(self, member):
+        if not self.size:
+            return
+        key = (member.guild.id, member.id)
+        self.members[key] = (member, time.monotonic())
+        self.members.move_to_end(key)
+        if len(self.members) > self.size:
+            self.members.popitem(last=False)
+    
+    def get(self, guild_id, member_id):
+        key = (guild_id, member_id)
+        entry = self.members.get(key)
+        if entry is None:
+            return None
+        member, cached_at = entry
+        # Roles change without events reaching us in this mode, so old entries are refetched
+        if time.monotonic() - cached_at > self.ttl:
+            del self.members[key]
+            return None
+        self.members.move_to_end(key)
+        return member
+
+member_cache = MemberCache(MEMBER_CACHE_SIZE if LOW_MEMORY_MODE else 0, MEMBER_CACHE_TTL)
+
+async def resolve_member(guild, member_id):
+    """Find a member in discord.py's cache, then ours, then over the API; None if they're gone"""
+    member = guild.get_member(member_id) or member_cache.get(guild.id, member_id)
+    if member is not None:
+        member_cache.stats['hits'] += 1
+        return member
+    if not LOW_MEMORY_MODE:
+        return None  # the full cache is authoritative
+    
+    try:
+        member = await guild.fetch_member(member_id)
+    except discord.HTTPException:
+        return None
+    member_cache.stats['fetches'] += 1
+    member_cache.remember(member)
+    return member
+
+class RoleUpdateQueue:
+    """Member role edits, deduplicated per member and drained fairly across guilds"""
+    def __init__(self, worker_count):
+        self.worker_count = worker_count
+        self.workers = []
+        self.pending = {}  # (guild_id, member_id): {'member', 'add', 'remove', 'reason'}
+        self.in_flight = {}  # (guild_id, member_id): change being applied right now
+        self.guild_queues = {}  # guild_id: deque of member_ids; dict order is the round-robin order
+        self.busy_guilds = set()
+        self.paused_until = {}  # guild_id: monotonic time its rate limit clears
+        self.wakeup = asyncio.Event()
+        self.completed = deque(maxlen=10000)  # monotonic times of applied edits
+        self.stats = {'enqueued': 0, 'merged': 0, 'applied': 0, 'unchanged': 0, 'failed': 0}
+    
+    def start(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self.worker()) for _ in range(self.worker_count)]
+    
+    def enqueue(self, member, add=(), remove=(), reason=None):
+        """Queue role changes for a member, folding them into any change already waiting"""
+        key = (member.guild.id, member.id)
+        change = self.pending.get(key)
+        if change is None:
+            change = {'member': member, 'add': set(), 'remove': set(), 'reason': reason}
+            self.pending[key] = change
+            self.guild_queues.setdefault(member.guild.id, deque()).append(member.id)
+        else:
+            change['member'] = member
+            change['reason'] = reason or change['reason']
+            self.stats['merged'] += 1
+        
+        for role_id in remove:
+            change['add'].discard(role_id)
+            change['remove'].add(role_id)
+        for role_id in add:
+            change['remove'].discard(role_id)
+            change['add'].add(role_id)
+        
+        self.stats['enqueued'] += 1
+        self.wakeup.set()
+    
+    def requeue(self, change, delay):
+        """Put a rate-limited change back without overriding anything queued since"""
+        member = change['member']
+        self.paused_until[member.guild.id] = time.monotonic() + delay
+        newer = self.pending.get((member.guild.id, member.id))
+        if newer:
+            self.enqueue(member, change['add'] - newer['remove'], change['remove'] - newer['add'], change['reason'])
+        else:
+            self.enqueue(member, change['add'], change['remove'], change['reason'])
+    
+    def depth(self):
+        return len(self.pending)
+    
+    def expected_roles(self, member):
+        """The member's role IDs once the edits in flight and waiting for them have landed"""
+        key = (member.guild.id, member.id)
+        roles = set(member._roles)
+        for change in (self.in_flight.get(key), self.pending.get(key)):
+            if change:
+                roles = (roles - change['remove']) | change['add']
+        return roles
+    
+    def drain_rate(self, window=60):
+        """Applied edits per second over the last window seconds"""
+        cutoff = time.monotonic() - window
+        return sum(1 for applied_at in self.completed if applied_at >= cutoff) / window
+    
+    def next_change(self):
+        """Pop the next change from the first idle guild, then rotate that guild to the back"""
+        now = time.monotonic()
+        for guild_id in list(self.guild_queues):
+            if guild_id in self.busy_guilds or self.paused_until.get(guild_id, 0) > now:
+                continue
+            
+            queue = self.guild_queues.pop(guild_id)
+            member_id = queue.popleft()
+            if queue:
+                self.guild_queues[guild_id] = queue
+            self.paused_until.pop(guild_id, None)
+            return self.pending.pop((guild_id, member_id))
+        return None
+    
+    async def worker(self):
+        while True:
+            change = self.next_change()
+            if change is None:
+                self.wakeup.clear()
+                # Sleep until new work arrives or the earliest rate-limit pause ends
+                now = time.monotonic()
+                pauses = [until - now for until in self.paused_until.values() if until > now]
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=min(pauses) if pauses else None)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            guild_id = change['member'].guild.id
+            key = (guild_id, change['member'].id)
+            self.busy_guilds.add(guild_id)
+            self.in_flight[key] = change
+            try:
+                await self.apply(change)
+            finally:
+                del self.in_flight[key]
+                self.busy_guilds.discard(guild_id)
+                self.wakeup.set()
+    
+    async def apply(self, change):
+        guild = change['member'].guild
+        member = guild.get_member(change['member'].id) or member_cache.get(guild.id, change['member'].id) or change['member']
+        
+        current = set(member._roles)
+        add = {role_id for role_id in change['add'] if guild.get_role(role_id)}
+        desired = (current - change['remove']) | add
+        # Low memory mode's member can be minutes old, so only the full cache is trusted to skip an edit
+        if LOW_MEMORY_MODE:
+            unchanged = not add and not change['remove']
+        else:
+            unchanged = desired == current
+        if unchanged:
+            self.stats['unchanged'] += 1
+            return
+        
+        # discord.py already waits out per-route buckets; RateLimited only surfaces for long waits
+        try:
+            if LOW_MEMORY_MODE:
+                # Changing roles one ID at a time leaves alone any role someone else changed since the snapshot
+                for role_id in add:
+                    await bot.http.add_role(guild.id, member.id, role_id, reason=change['reason'])
+                for role_id in change['remove']:
+                    await bot.http.remove_role(guild.id, member.id, role_id, reason=change['reason'])
+                member._roles = discord.utils.SnowflakeList(desired)
+                member_cache.remember(member)
+            else:
+                updated = await member.edit(roles=[discord.Object(id=role_id) for role_id in desired], reason=change['reason'])
+                if updated:
+                    # The gateway update can arrive after the next change for this member is applied
+                    member._roles = updated._roles
+                    member_cache.remember(updated)
+            self.stats['applied'] += 1
+            self.completed.append(time.monotonic())
+        except discord.RateLimited as e:
+            self.requeue(change, e.retry_after)
+        except discord.Forbidden:
+            self.stats['failed'] += 1
+            print(f"Missing permissions to manage roles for {member.display_name}")
+        except discord.HTTPException as e:
+            self.stats['failed'] += 1
+            print(f"HTTP error updating roles for {member.display_name}: {e}")
+        except Exception as e:
+            self.stats['failed'] += 1
+            print(f"Error updating roles for {member.display_name}: {e}")
+
+role_queue = RoleUpdateQueue(ROLE_QUEUE_WORKERS)
+
+class ReactionRoleDebouncer:
+    """Holds a member's reaction role events for a short window, then queues their net effect as one change"""
+    def __init__(self, window):
+        self.window = window
+        self.pending = {}  # (guild_id, member_id): [member, [(message_id, role_id, added)]]
+        self.stats = {'events': 0, 'batches': 0, 'unchanged': 0}
+    
+    def add(self, member, message_id, role_id, added):
+        key = (member.guild.id, member.id)
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = self.pending[key] = [member, []]
+            asyncio.get_running_loop().call_later(self.window, self.flush, key)
+        entry[0] = member
+        entry[1].append((message_id, role_id, added))
+        self.stats['events'] += 1
+    
+    def flush(self, key):
+        member, events = self.pending.pop(key)
+        member = member.guild.get_member(member.id) or member_cache.get(member.guild.id, member.id) or member
+        self.stats['batches'] += 1
+        
+        # Replaying in order means an add and remove of the same reaction cancel out. Edits still
+        # queued from an earlier window count too, or undoing one would look like no change
+        current = role_queue.expected_roles(member)
+        roles = set(current)
+        for message_id, role_id, added in events:
+            config = reaction_roles.get(message_id)
+            if config:
+                apply_reaction_event(roles, config, role_id, added)
+        
+        if roles == current:
+            self.stats['unchanged'] += 1
+            return
+        role_queue.enqueue(member, add=roles - current, remove=current - roles, reason="Reaction role")
+    
+    def calls_saved(self):
+        """Role edits avoided compared to one call per reaction event"""
+        return self.stats['events'] - (self.stats['batches'] - self.stats['unchanged'])
+
+reaction_debouncer = ReactionRoleDebouncer(REACTION_DEBOUNCE)
+
+class ChannelSendQueue:
+    """Outgoing messages queued per channel, each channel drained in order by its own worker"""
+    def __init__(self, limit):
+        self.limit = limit
+        self.queues = {}  # channel_id: deque of (dedupe_key, payload, enqueued_at)
+        self.queued_keys = {}  # channel_id: dedupe keys waiting in that channel
+        self.workers = {}  # channel_id: worker task
+        self.latencies = deque(maxlen=1000)  # seconds from enqueue to API ack
+        self.stats = {'enqueued': 0, 'sent': 0, 'dropped_oldest': 0, 'dropped_duplicate': 0, 'failed': 0}
+    
+    def enqueue(self, channel, payload, dedupe_key=None):
+        """Queue send() kwargs, or a coroutine returning them, without waiting; False if dropped as a duplicate"""
+        queue = self.queues.setdefault(channel.id, deque())
+        queued_keys = self.queued_keys.setdefault(channel.id, set())
+        
+        # Overflow policy: a repeat of a response still waiting is dropped, otherwise the oldest message goes
+        if dedupe_key is not None and dedupe_key in queued_keys:
+            self.discard(payload)
+            self.stats['dropped_duplicate'] += 1
+            return False
+        
+        if len(queue) >= self.limit:
+            old_key, old_payload, _ = queue.popleft()
+            queued_keys.discard(old_key)
+            self.discard(old_payload)
+            self.stats['dropped_oldest'] += 1
+        
+        queue.append((dedupe_key, payload, time.monotonic()))
+        if dedupe_key is not None:
+            queued_keys.add(dedupe_key)
+        self.stats['enqueued'] += 1
+        
+        if channel.id not in self.workers:
+            self.workers[channel.id] = asyncio.create_task(self.drain(channel))
+        return True
+    
+    def discard(self, payload):
+        if asyncio.iscoroutine(payload):
+            payload.close()
+    
+    async def drain(self, channel):
+        queue = self.queues[channel.id]
+        queued_keys = self.queued_keys[channel.id]
+        try:
+            while queue:
+                dedupe_key, payload, enqueued_at = queue.popleft()
+                queued_keys.discard(dedupe_key)
+                try:
+                    if asyncio.iscoroutine(payload):
+                        payload = await payload
+                        if payload is None:
+                            continue
+                    await channel.send(**payload)
+                    self.stats['sent'] += 1
+                    self.latencies.append(time.monotonic() - enqueued_at)
+                except discord.HTTPException as e:
+                    self.stats['failed'] += 1
+                    print(f"Failed to send queued message in channel {channel.id}: {e}")
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    print(f"Error sending queued message in channel {channel.id}: {e}")
+        finally:
+            del self.workers[channel.id]
+            if not queue:
+                del self.queues[channel.id]
+                del self.queued_keys[channel.id]
+    
+    def latency_percentile(self, percentile):
+        """Enqueue-to-ack latency in milliseconds at the given percentile of recent sends"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))] * 1000
+
+send_queue = ChannelSendQueue(SEND_QUEUE_LIMIT)
+
+prefilter_stats = {'bot_or_webhook': 0, 'no_autoresponders': 0, 'channel': 0, 'too_short': 0, 'evaluated': 0}
+
+role_sync_stats = {'queued': 0, 'unchanged': 0, 'calls_avoided': 0}
+
+def reconcile_ladder_roles(member, ladder, count, reason):
+    """Queue the edit that leaves member with exactly the ladder role earned at count"""
+    current = set(member._roles)
+    target = ladder.target_role(count, member.guild)
+    desired = current - ladder.role_ids
+    if target:
+        desired.add(target)
+    
+    # The old remove-then-add approach spent one call on each step
+    held = {role_id for role_id in current & ladder.role_ids if member.guild.get_role(role_id)}
+    legacy_calls = (1 if held else 0) + (1 if target else 0)
+    
+    if desired == current:
+        role_sync_stats['unchanged'] += 1
+        role_sync_stats['calls_avoided'] += legacy_calls
+        return
+    
+    role_queue.enqueue(member, add=desired - current, remove=current - desired, reason=reason)
+    role_sync_stats['queued'] += 1
+    role_sync_stats['calls_avoided'] += max(legacy_calls - 1, 0)
+
+async def image_payload(url, filename):
+    """Download an image into send() kwargs, or None if it can't be used"""
+    image_data = await download_image(url)
+    if not image_data:
+        return None
+    return {'file': discord.File(io.BytesIO(image_data), filename=filename)}
+
 async def download_image(url, max_size=8*1024*1024):
     """Download and validate image"""
     try:
@@ -359,17 +1735,18 @@ class EndGameButton(discord.ui.Button):
         await interaction.response.edit_message(embed=embed, view=self.view)
 
 class ConfigView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(timeout=300)
+        self.state = state
     
     @discord.ui.button(label="Command Permissions", style=discord.ButtonStyle.blurple, emoji="🔐")
     async def command_permissions(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = CommandPermissionsModal()
+        modal = CommandPermissionsModal(self.state)
         await interaction.response.send_modal(modal)
     
     @discord.ui.button(label="Admin Roles", style=discord.ButtonStyle.green, emoji="👑")
     async def admin_roles(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = AdminRolesModal()
+        modal = AdminRolesModal(self.state)
         await interaction.response.send_modal(modal)
     
     @discord.ui.button(label="Guild Settings", style=discord.ButtonStyle.secondary, emoji="🏠")
@@ -391,16 +1768,16 @@ class ConfigView(discord.ui.View):
         else:
             embed.add_field(name="Guild Restriction", value="Not restricted (all servers)", inline=False)
         
-        if bot_config['admin_roles']:
-            admin_roles = [f"<@&{role_id}>" for role_id in bot_config['admin_roles']]
+        if self.state.admin_roles:
+            admin_roles = [f"<@&{role_id}>" for role_id in self.state.admin_roles]
             embed.add_field(name="Admin Roles", value=", ".join(admin_roles), inline=False)
         
         # List all available commands
-        all_commands = list(bot_config['command_permissions'].keys())
+        all_commands = list(self.state.command_permissions.keys())
         
         perms_text = ""
         for cmd in all_commands:
-            roles = bot_config['command_permissions'].get(cmd, [])
+            roles = self.state.command_permissions.get(cmd, [])
             if roles:
                 role_mentions = [f"<@&{role_id}>" for role_id in roles]
                 perms_text += f"**{cmd}:** {', '.join(role_mentions)}\n"
@@ -410,15 +1787,49 @@ class ConfigView(discord.ui.View):
         if perms_text:
             embed.add_field(name="Command Permissions", value=perms_text, inline=False)
         
+        skipped = sum(count for gate, count in prefilter_stats.items() if gate != 'evaluated')
+        embed.add_field(
+            name="Autoresponder Prefilter",
+            value=(
+                f"{prefilter_stats['evaluated']} messages evaluated, {skipped} skipped "
+                f"(bots/webhooks {prefilter_stats['bot_or_webhook']}, no autoresponders {prefilter_stats['no_autoresponders']}, "
+                f"channel {prefilter_stats['channel']}, too short {prefilter_stats['too_short']})"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Send Queue",
+            value=(
+                f"{send_queue.stats['sent']} sent, p50 {send_queue.latency_percentile(50):.0f}ms / p95 {send_queue.latency_percentile(95):.0f}ms to ack, "
+                f"{send_queue.stats['dropped_duplicate']} duplicates and {send_queue.stats['dropped_oldest']} overflow dropped, "
+                f"{send_queue.stats['failed']} failed"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Role Update Queue",
+            value=f"{role_queue.depth()} pending, {role_queue.drain_rate():.2f} edits/s (last minute), {role_queue.stats['failed']} failed",
+            inline=False
+        )
+        embed.add_field(
+            name="Reaction Roles",
+            value=(
+                f"{reaction_debouncer.stats['events']} reactions folded into {reaction_debouncer.stats['batches']} batches, "
+                f"{reaction_debouncer.calls_saved()} role edits saved"
+            ),
+            inline=False
+        )
+        
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 class CommandPermissionsModal(discord.ui.Modal):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(title="Set Command Permissions")
+        self.state = state
     
     command = discord.ui.TextInput(
         label="Command Name",
-        placeholder="Available commands: " + ", ".join(list(bot_config['command_permissions'].keys())),
+        placeholder="Available commands: " + ", ".join(COMMAND_NAMES),
         max_length=50
     )
     
@@ -431,7 +1842,7 @@ class CommandPermissionsModal(discord.ui.Modal):
     
     async def on_submit(self, interaction: discord.Interaction):
         # Validate command name
-        valid_commands = list(bot_config['command_permissions'].keys())
+        valid_commands = list(self.state.command_permissions.keys())
         
         if self.command.value not in valid_commands:
             await interaction.response.send_message(f"Invalid command. Available commands: {', '.join(valid_commands)}", ephemeral=True)
@@ -456,14 +1867,17 @@ class CommandPermissionsModal(discord.ui.Modal):
                 await interaction.response.send_message("Invalid role ID format.", ephemeral=True)
                 return
         
-        bot_config['command_permissions'][self.command.value] = role_ids
+        self.state.command_permissions[self.command.value] = role_ids
+        self.state.persist('bot_config', 'command_permissions', self.state.command_permissions)
+        self.state.rebuild_permissions()
         
         permission_text = "Administrator required" if not role_ids else f"Roles: {', '.join([f'<@&{r}>' for r in role_ids])}"
         await interaction.response.send_message(f"Permissions updated for **{self.command.value}**: {permission_text}", ephemeral=True)
 
 class AdminRolesModal(discord.ui.Modal):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(title="Set Admin Roles")
+        self.state = state
     
     roles = discord.ui.TextInput(
         label="Admin Role IDs (comma-separated)",
@@ -492,7 +1906,9 @@ class AdminRolesModal(discord.ui.Modal):
                 await interaction.response.send_message("Invalid role ID format.", ephemeral=True)
                 return
         
-        bot_config['admin_roles'] = role_ids
+        self.state.admin_roles = role_ids
+        self.state.persist('bot_config', 'admin_roles', role_ids)
+        self.state.rebuild_permissions()
         await interaction.response.send_message("Admin roles updated successfully!", ephemeral=True)
 
 class GuildSettingsModal(discord.ui.Modal):
@@ -538,6 +1954,46 @@ class GuildSettingsModal(discord.ui.Modal):
         except ValueError:
             await interaction.response.send_message("Invalid guild ID format.", ephemeral=True)
 
+def build_embed(embed_data):
+    """Build the Embed described by the embed creator's fields"""
+    embed = discord.Embed(color=embed_data['color'])
+    
+    if embed_data['title']:
+        embed.title = embed_data['title']
+    if embed_data['description']:
+        embed.description = embed_data['description']
+    if embed_data['thumbnail']:
+        embed.set_thumbnail(url=embed_data['thumbnail'])
+    if embed_data['image']:
+        embed.set_image(url=embed_data['image'])
+    if embed_data['footer']:
+        embed.set_footer(text=embed_data['footer'])
+    
+    return embed
+
+def embed_problem(embed):
+    """Describe why Discord would reject an embed, or return None"""
+    if not (embed.title or embed.description or embed.thumbnail.url or embed.image.url or embed.footer.text):
+        return "The embed is empty."
+    if len(embed) > 6000:
+        return "Embeds are limited to 6000 characters in total."
+    for url in (embed.thumbnail.url, embed.image.url):
+        if url and not url.startswith(('http://', 'https://')):
+            return f"`{url}` isn't an http(s) link."
+    return None
+
+def remember_sent_embed(message_id, embed_data):
+    embed_storage[message_id] = embed_data
+    storage.put('embed_storage', message_id, embed_data)
+    evict_sent_embeds()
+
+def evict_sent_embeds():
+    """Drop the oldest sent embeds, in memory and on disk, once over EMBED_STORAGE_LIMIT"""
+    while len(embed_storage) > EMBED_STORAGE_LIMIT:
+        message_id = next(iter(embed_storage))
+        del embed_storage[message_id]
+        storage.delete('embed_storage', message_id)
+
 class EmbedCreatorView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=300)
@@ -580,21 +2036,41 @@ class EmbedCreatorView(discord.ui.View):
         modal = SendEmbedModal(self.embed_data)
         await interaction.response.send_modal(modal)
     
+    @discord.ui.button(label="Save Template", style=discord.ButtonStyle.gray)
+    async def save_template(self, interaction: discord.Interaction, button: discord.ui.Button):
+        modal = SaveEmbedTemplateModal(self.embed_data)
+        await interaction.response.send_modal(modal)
+    
     def create_embed(self):
-        embed = discord.Embed(color=self.embed_data['color'])
-        
-        if self.embed_data['title']:
-            embed.title = self.embed_data['title']
-        if self.embed_data['description']:
-            embed.description = self.embed_data['description']
-        if self.embed_data['thumbnail']:
-            embed.set_thumbnail(url=self.embed_data['thumbnail'])
-        if self.embed_data['image']:
-            embed.set_image(url=self.embed_data['image'])
-        if self.embed_data['footer']:
-            embed.set_footer(text=self.embed_data['footer'])
+        return build_embed(self.embed_data)
+
+class SaveEmbedTemplateModal(discord.ui.Modal):
+    def __init__(self, embed_data):
+        super().__init__(title="Save Embed Template")
+        self.embed_data = embed_data
+    
+    name = discord.ui.TextInput(
+        label="Template Name",
+        placeholder="Name to send it by with /send_embed_template",
+        max_length=50
+    )
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        state = get_guild_state(interaction.guild_id)
+        name = self.name.value.strip()
+        if not name:
+            await interaction.response.send_message("Template name can't be empty.", ephemeral=True)
+            return
+        embed = build_embed(self.embed_data)
         
-        return embed
+        problem = embed_problem(embed)
+        if problem:
+            await interaction.response.send_message(f"Can't save this template: {problem}", ephemeral=True)
+            return
+        
+        replaced = name in state.embed_templates
+        state.save_embed_template(name, embed.to_dict())
+        await interaction.response.send_message(f"Template `{name}` {'updated' if replaced else 'saved'}!", ephemeral=True)
 
 class EmbedTitleModal(discord.ui.Modal):
     def __init__(self, embed_data):
@@ -702,21 +2178,9 @@ class SendEmbedModal(discord.ui.Modal):
                 await interaction.response.send_message("Channel not found!", ephemeral=True)
                 return
             
-            embed = EmbedCreatorView().create_embed()
-            embed.color = self.embed_data['color']
-            if self.embed_data['title']:
-                embed.title = self.embed_data['title']
-            if self.embed_data['description']:
-                embed.description = self.embed_data['description']
-            if self.embed_data['thumbnail']:
-                embed.set_thumbnail(url=self.embed_data['thumbnail'])
-            if self.embed_data['image']:
-                embed.set_image(url=self.embed_data['image'])
-            if self.embed_data['footer']:
-                embed.set_footer(text=self.embed_data['footer'])
-            
+            embed = build_embed(self.embed_data)
             message = await channel.send(embed=embed)
-            embed_storage[message.id] = self.embed_data
+            remember_sent_embed(message.id, dict(self.embed_data))
             
             await interaction.response.send_message(f"Embed sent to {channel.mention}!", ephemeral=True)
         except ValueError:
@@ -732,7 +2196,7 @@ class ReactionRoleView(discord.ui.View):
             'description': 'React with an emoji to get a role!',
             'color': 0x0099ff
         }
-        self.reaction_mappings = {}  # emoji: role_id
+        self.reaction_mappings = {}  # emoji key: role_id
     
     @discord.ui.button(label="Set Embed", style=discord.ButtonStyle.blurple)
     async def set_embed(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -816,7 +2280,12 @@ class AddReactionRoleModal(discord.ui.Modal):
                 await interaction.response.send_message("Role not found!", ephemeral=True)
                 return
             
-            self.reaction_mappings[self.emoji.value] = role_id
+            emoji_key = reaction_emoji_key(interaction.guild, self.emoji.value)
+            if emoji_key is None:
+                await interaction.response.send_message("Emoji not found! Custom emojis must be from a server the bot is in.", ephemeral=True)
+                return
+            
+            self.reaction_mappings[emoji_key] = role_id
             await interaction.response.send_message(f"Added reaction role: {self.emoji.value} → {role.name}", ephemeral=True)
         except ValueError:
             await interaction.response.send_message("Invalid role ID!", ephemeral=True)
@@ -833,7 +2302,35 @@ class CreateReactionRoleMessageModal(discord.ui.Modal):
         max_length=20
     )
     
+    mode = discord.ui.TextInput(
+        label="Mode",
+        placeholder="toggle, unique, verify or max:N",
+        default="toggle",
+        max_length=10
+    )
+    
+    style = discord.ui.TextInput(
+        label="Style",
+        placeholder="reactions, buttons or select",
+        default="reactions",
+        max_length=10
+    )
+    
     async def on_submit(self, interaction: discord.Interaction):
+        try:
+            mode, limit = parse_reaction_mode(self.mode.value)
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        
+        style = self.style.value.strip().lower()
+        if style not in ROLE_PANEL_STYLES:
+            await interaction.response.send_message(f"Style must be one of: {', '.join(ROLE_PANEL_STYLES)}", ephemeral=True)
+            return
+        if style != 'reactions' and len(self.reaction_mappings) > 25:
+            await interaction.response.send_message("Button and select panels hold at most 25 roles!", ephemeral=True)
+            return
+        
         try:
             channel = bot.get_channel(int(self.channel_id.value))
             if not channel:
@@ -848,49 +2345,159 @@ class CreateReactionRoleMessageModal(discord.ui.Modal):
             
             # Add reaction role info to embed
             roles_text = ""
-            for emoji, role_id in self.reaction_mappings.items():
+            for emoji_key, role_id in self.reaction_mappings.items():
+                emoji = reaction_emoji(emoji_key)
                 role = interaction.guild.get_role(role_id)
-                if role:
+                if emoji and role:
                     roles_text += f"{emoji} - {role.name}\n"
             
             if roles_text:
                 embed.add_field(name="Available Roles", value=roles_text, inline=False)
             
+            config = {'roles': dict(self.reaction_mappings), 'mode': mode, 'limit': limit}
+            if style != 'reactions':
+                # Panels route clicks by custom_id, so they need no reactions and no reaction_roles entry
+                panel_id = interaction.id
+                config.update(style=style, guild_id=interaction.guild_id, channel_id=channel.id)
+                message = await channel.send(embed=embed, view=RolePanelView(panel_id, config, interaction.guild))
+                config['message_id'] = message.id
+                storage.put('role_panels', panel_id, config)
+                await interaction.response.send_message(f"Role panel created in {channel.mention}!", ephemeral=True)
+                return
+            
             message = await channel.send(embed=embed)
             
+            # Store before reacting so early reactions are already handled
+            reaction_roles[message.id] = config
+            storage.put('reaction_roles', message.id, config)
+            await interaction.response.send_message(f"Reaction role message created in {channel.mention}!", ephemeral=True)
+            
             # Add reactions
-            for emoji in self.reaction_mappings.keys():
+            failed = []
+            for emoji_key in self.reaction_mappings.keys():
+                emoji = reaction_emoji(emoji_key)
+                if emoji is None:
+                    failed.append(str(emoji_key))
+                    continue
                 try:
                     await message.add_reaction(emoji)
-                except:
-                    pass  # Skip invalid emojis
-            
-            # Store reaction role mapping
-            reaction_roles[message.id] = self.reaction_mappings
-            
-            await interaction.response.send_message(f"Reaction role message created in {channel.mention}!", ephemeral=True)
+                except discord.HTTPException:
+                    failed.append(str(emoji))
+            if failed:
+                await interaction.followup.send(f"Couldn't add these reactions: {', '.join(failed)}", ephemeral=True)
             
         except ValueError:
             await interaction.response.send_message("Invalid channel ID!", ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f"Error creating message: {str(e)}", ephemeral=True)
 
+ROLE_PANEL_STYLES = ('reactions', 'buttons', 'select')
+
+async def apply_panel_choice(interaction, current, desired):
+    """Queue a role panel click's net change as one edit and tell the member what changed"""
+    added = {role_id for role_id in desired - current if interaction.guild.get_role(role_id)}
+    removed = current - desired
+    if not added and not removed:
+        await interaction.response.send_message("Your roles are already up to date.", ephemeral=True)
+        return
+    
+    role_queue.enqueue(interaction.user, add=added, remove=removed, reason="Role panel")
+    lines = [f"➕ <@&{role_id}>" for role_id in added] + [f"➖ <@&{role_id}>" for role_id in removed]
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+class RolePanelSelect(discord.ui.Select):
+    def __init__(self, panel_id, config, guild):
+        options = []
+        for emoji_key, role_id in config['roles'].items():
+            role = guild.get_role(role_id) if guild else None
+            options.append(discord.SelectOption(label=role.name if role else str(role_id), value=str(role_id), emoji=reaction_emoji(emoji_key)))
+        
+        max_values = {'unique': 1, 'max': config['limit']}.get(config['mode'], len(options))
+        super().__init__(
+            custom_id=f"role_panel:{panel_id}:select",
+            placeholder="Choose your roles",
+            min_values=0,
+            max_values=min(max_values, len(options)),
+            options=options
+        )
+        self.config = config
+    
+    async def callback(self, interaction: discord.Interaction):
+        # The selection is the member's whole choice from this panel
+        panel_roles = set(self.config['roles'].values())
+        selected = {int(value) for value in self.values} & panel_roles
+        current = set(interaction.user._roles)
+        if self.config['mode'] == 'verify':
+            desired = current | selected
+        else:
+            desired = (current - panel_roles) | selected
+        await apply_panel_choice(interaction, current, desired)
+
+class RolePanelButton(discord.ui.Button):
+    def __init__(self, panel_id, config, emoji_key, role_id, guild):
+        role = guild.get_role(role_id) if guild else None
+        label = role.name if role else str(role_id)
+        super().__init__(
+            # Role names run to 100 characters but Discord rejects button labels over 80
+            label=f"{label[:77]}..." if len(label) > 80 else label,
+            emoji=reaction_emoji(emoji_key),
+            style=discord.ButtonStyle.gray,
+            custom_id=f"role_panel:{panel_id}:{role_id}"
+        )
+        self.config = config
+        self.role_id = role_id
+    
+    async def callback(self, interaction: discord.Interaction):
+        current = set(interaction.user._roles)
+        desired = set(current)
+        # A button has no un-react, so clicking a held role is how it gets dropped
+        if self.role_id in current and self.config['mode'] != 'verify':
+            desired.discard(self.role_id)
+        else:
+            apply_reaction_event(desired, self.config, self.role_id, True)
+        
+        if desired == current and self.config['mode'] == 'max':
+            await interaction.response.send_message(
+                f"You already have {self.config['limit']} role(s) from this panel. Click one you have to drop it first.",
+                ephemeral=True
+            )
+            return
+        await apply_panel_choice(interaction, current, desired)
+
+class RolePanelView(discord.ui.View):
+    """Persistent role panel; custom_ids are built from the panel ID so clicks still route after a restart"""
+    def __init__(self, panel_id, config, guild=None):
+        super().__init__(timeout=None)
+        # Labels only matter when posting; re-attached views just need matching custom_ids
+        if config['style'] == 'select':
+            self.add_item(RolePanelSelect(panel_id, config, guild))
+        else:
+            for emoji_key, role_id in config['roles'].items():
+                self.add_item(RolePanelButton(panel_id, config, emoji_key, role_id, guild))
+
+def restore_role_panels():
+    """Re-attach every saved role panel to its message"""
+    for panel_id, config in storage.load('role_panels').items():
+        config['roles'] = {int(key) if key.isdigit() else key: role_id for key, role_id in config['roles'].items()}
+        bot.add_view(RolePanelView(panel_id, config), message_id=config['message_id'])
+
 class BoostSetupView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(timeout=300)
+        self.state = state
     
     @discord.ui.button(label="Set Boost Roles", style=discord.ButtonStyle.blurple)
     async def set_boost_roles(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = BoostRolesModal()
+        modal = BoostRolesModal(self.state)
         await interaction.response.send_modal(modal)
     
     @discord.ui.button(label="View Settings", style=discord.ButtonStyle.gray)
     async def view_settings(self, interaction: discord.Interaction, button: discord.ui.Button):
         embed = discord.Embed(title="Boost Settings", color=0xff69b4)
         
-        if boost_settings['roles']:
+        if self.state.boost_roles:
             roles_text = ""
-            for boost_count, role_id in boost_settings['roles'].items():
+            for boost_count, role_id in self.state.boost_roles.items():
                 role = interaction.guild.get_role(role_id)
                 role_name = role.name if role else "Unknown Role"
                 roles_text += f"**{boost_count} boosts:** {role_name}\n"
@@ -898,8 +2505,9 @@ class BoostSetupView(discord.ui.View):
         else:
             embed.add_field(name="Boost Roles", value="None configured", inline=False)
         
-        tracked_users = len(boost_settings['tracking'])
+        tracked_users = len(self.state.boost_tracking)
         embed.add_field(name="Tracked Users", value=str(tracked_users), inline=True)
+        embed.add_field(name="Role API Calls Avoided", value=str(role_sync_stats['calls_avoided']), inline=True)
         
         total_boosts = interaction.guild.premium_subscription_count or 0
         embed.add_field(name="Current Server Boosts", value=str(total_boosts), inline=True)
@@ -907,8 +2515,9 @@ class BoostSetupView(discord.ui.View):
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 class BoostRolesModal(discord.ui.Modal):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(title="Set Boost Roles")
+        self.state = state
     
     role1 = discord.ui.TextInput(label="1 Boost Role ID", required=False, max_length=20)
     role2 = discord.ui.TextInput(label="2 Boosts Role ID", required=False, max_length=20)
@@ -931,28 +2540,31 @@ class BoostRolesModal(discord.ui.Modal):
                     role_id = int(role_id_str)
                     role = interaction.guild.get_role(role_id)
                     if role:
-                        boost_settings['roles'][boost_count] = role_id
+                        self.state.boost_roles[boost_count] = role_id
+                        self.state.persist('boost_roles', boost_count, role_id)
                 except ValueError:
                     continue
         
+        self.state.rebuild_role_ladders()
         await interaction.response.send_message("Boost roles updated!", ephemeral=True)
 
 class InviteSetupView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(timeout=300)
+        self.state = state
     
     @discord.ui.button(label="Set Invite Roles", style=discord.ButtonStyle.blurple)
     async def set_invite_roles(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = InviteRolesModal()
+        modal = InviteRolesModal(self.state)
         await interaction.response.send_modal(modal)
     
     @discord.ui.button(label="View Settings", style=discord.ButtonStyle.gray)
     async def view_settings(self, interaction: discord.Interaction, button: discord.ui.Button):
         embed = discord.Embed(title="Invite Settings", color=0x00ff00)
         
-        if invite_settings['roles']:
+        if self.state.invite_roles:
             roles_text = ""
-            for invite_count, role_id in invite_settings['roles'].items():
+            for invite_count, role_id in self.state.invite_roles.items():
                 role = interaction.guild.get_role(role_id)
                 role_name = role.name if role else "Unknown Role"
                 roles_text += f"**{invite_count} invites:** {role_name}\n"
@@ -960,14 +2572,16 @@ class InviteSetupView(discord.ui.View):
         else:
             embed.add_field(name="Invite Roles", value="None configured", inline=False)
         
-        tracked_users = len(invite_settings['tracking'])
+        tracked_users = len(self.state.invite_tracking)
         embed.add_field(name="Tracked Users", value=str(tracked_users), inline=True)
+        embed.add_field(name="Role API Calls Avoided", value=str(role_sync_stats['calls_avoided']), inline=True)
         
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 class InviteRolesModal(discord.ui.Modal):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(title="Set Invite Roles")
+        self.state = state
     
     role1 = discord.ui.TextInput(label="5 Invites Role ID", required=False, max_length=20)
     role2 = discord.ui.TextInput(label="10 Invites Role ID", required=False, max_length=20)
@@ -990,78 +2604,218 @@ class InviteRolesModal(discord.ui.Modal):
                     role_id = int(role_id_str)
                     role = interaction.guild.get_role(role_id)
                     if role:
-                        invite_settings['roles'][invite_count] = role_id
+                        self.state.invite_roles[invite_count] = role_id
+                        self.state.persist('invite_roles', invite_count, role_id)
                 except ValueError:
                     continue
         
+        self.state.rebuild_role_ladders()
         await interaction.response.send_message("Invite roles updated!", ephemeral=True)
 
 # Update existing classes with permission checks
 class AutoresponderManagementView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(timeout=300)
+        self.state = state
     
     @discord.ui.button(label="View All", style=discord.ButtonStyle.blurple, emoji="👁️")
     async def view_all(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not autoresponders:
-            await interaction.response.send_message("No autoresponders configured.", ephemeral=True)
-            return
+        await open_autoresponder_browser(interaction, self.state, "No autoresponders configured.")
+    
+    @discord.ui.button(label="Edit", style=discord.ButtonStyle.gray, emoji="✏️")
+    async def edit_autoresponder(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await open_autoresponder_browser(interaction, self.state, "No autoresponders to edit.")
+    
+    @discord.ui.button(label="Delete", style=discord.ButtonStyle.red, emoji="🗑️")
+    async def delete_autoresponder(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await open_autoresponder_browser(interaction, self.state, "No autoresponders to delete.")
+    
+    @discord.ui.button(label="Channels", style=discord.ButtonStyle.gray, emoji="📺")
+    async def channels(self, interaction: discord.Interaction, button: discord.ui.Button):
+        modal = AutoresponderChannelsModal(self.state)
+        await interaction.response.send_modal(modal)
+
+class AutoresponderChannelsModal(discord.ui.Modal):
+    def __init__(self, state):
+        super().__init__(title="Autoresponder Channels")
+        self.state = state
+        
+        self.allow = discord.ui.TextInput(
+            label="Only respond in (channel IDs or mentions)",
+            placeholder="Leave empty to respond in every channel",
+            default=', '.join(str(channel_id) for channel_id in state.autoresponder_channels['allow']),
+            required=False,
+            max_length=1000
+        )
+        
+        self.deny = discord.ui.TextInput(
+            label="Never respond in (channel IDs or mentions)",
+            placeholder="Channels to ignore, e.g. #announcements",
+            default=', '.join(str(channel_id) for channel_id in state.autoresponder_channels['deny']),
+            required=False,
+            max_length=1000
+        )
+        
+        self.add_item(self.allow)
+        self.add_item(self.deny)
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        channel_lists = {}
+        for name, field in (('allow', self.allow), ('deny', self.deny)):
+            channel_ids = []
+            invalid_channels = []
+            for entry in field.value.split(','):
+                entry = entry.strip().removeprefix('<#').removesuffix('>')
+                if not entry:
+                    continue
+                if entry.isdigit() and interaction.guild.get_channel_or_thread(int(entry)):
+                    channel_ids.append(int(entry))
+                else:
+                    invalid_channels.append(entry)
+            
+            if invalid_channels:
+                await interaction.response.send_message(f"Invalid channels: {', '.join(invalid_channels)}", ephemeral=True)
+                return
+            channel_lists[name] = channel_ids
+        
+        self.state.autoresponder_channels = channel_lists
+        self.state.persist('bot_config', 'autoresponder_channels', channel_lists)
+        self.state.rebuild_channel_filters()
+        
+        allow_text = ', '.join(f"<#{channel_id}>" for channel_id in channel_lists['allow']) or "All channels"
+        deny_text = ', '.join(f"<#{channel_id}>" for channel_id in channel_lists['deny']) or "None"
+        await interaction.response.send_message(f"Autoresponder channels updated.\n**Respond in:** {allow_text}\n**Ignore:** {deny_text}", ephemeral=True)
+
+async def open_autoresponder_browser(interaction, state, empty_message):
+    if not state.autoresponders:
+        await interaction.response.send_message(empty_message, ephemeral=True)
+        return
+    
+    view = AutoresponderBrowserView(state)
+    await interaction.response.send_message(embed=view.render(), view=view, ephemeral=True)
+
+class AutoresponderBrowserView(discord.ui.View):
+    """One page of autoresponders at a time, with search and edit/delete menus for the visible page"""
+    def __init__(self, state, query=''):
+        super().__init__(timeout=300)
+        self.state = state
+        self.query = query
+        self.page = 0
+        self.triggers = []
+        self.page_selects = []
+        self.refresh()
+    
+    def page_count(self):
+        return max(1, -(-len(self.triggers) // AUTORESPONDER_PAGE_SIZE))
+    
+    def page_triggers(self):
+        start = self.page * AUTORESPONDER_PAGE_SIZE
+        return self.triggers[start:start + AUTORESPONDER_PAGE_SIZE]
+    
+    def refresh(self):
+        """Re-read the trigger index and rebuild the controls for the current page"""
+        if self.query:
+            self.triggers = [trigger for trigger in self.state.trigger_index if self.query in trigger.lower()]
+        else:
+            self.triggers = self.state.trigger_index
+        self.page = min(self.page, self.page_count() - 1)
+        
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count() - 1
         
-        embed = discord.Embed(title="All Autoresponders", color=0x00ff00)
-        for trigger, data in autoresponders.items():
+        for select in self.page_selects:
+            self.remove_item(select)
+        self.page_selects = []
+        visible = [trigger for trigger in self.page_triggers() if trigger in self.state.autoresponders]
+        if visible:
+            self.page_selects = [EditAutoresponderSelect(self.state, visible), DeleteAutoresponderSelect(self.state, visible)]
+            for select in self.page_selects:
+                self.add_item(select)
+    
+    def render(self):
+        title = f"Autoresponders matching \"{self.query}\"" if self.query else "All Autoresponders"
+        embed = discord.Embed(title=title, color=0x00ff00)
+        for trigger in self.page_triggers():
+            data = self.state.autoresponders.get(trigger)
+            if data is None:
+                continue
             value = f"**Response:** {data['response'][:100]}{'...' if len(data['response']) > 100 else ''}\n"
             value += f"**Type:** {'Embed' if data['is_embed'] else 'Normal'}\n"
-            value += f"**Cooldown:** {data['cooldown']}s\n"
-            value += f"**Roles:** {', '.join(data['allowed_roles']) if data['allowed_roles'] else 'All'}"
+            value += f"**Cooldown:** {format_cooldown(data)}\n"
+            # Roles are trimmed so a full page stays under the 6000 character embed limit
+            value += f"**Roles:** {', '.join(data['allowed_roles'])[:200] if data['allowed_roles'] else 'All'}"
+            if data.get('disabled'):
+                value += "\n**Status:** Disabled for being too slow, edit it to re-enable"
             embed.add_field(name=f"🔸 {trigger}", value=value, inline=False)
         
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-    
-    @discord.ui.button(label="Edit", style=discord.ButtonStyle.gray, emoji="✏️")
-    async def edit_autoresponder(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not autoresponders:
-            await interaction.response.send_message("No autoresponders to edit.", ephemeral=True)
-            return
-        
-        select = EditAutoresponderSelect()
-        view = discord.ui.View()
-        view.add_item(select)
-        await interaction.response.send_message("Select an autoresponder to edit:", view=view, ephemeral=True)
+        if not self.triggers:
+            embed.description = "No autoresponders found."
+        embed.set_footer(text=f"Page {self.page + 1}/{self.page_count()} • {len(self.triggers)} autoresponder(s)")
+        return embed
     
-    @discord.ui.button(label="Delete", style=discord.ButtonStyle.red, emoji="🗑️")
-    async def delete_autoresponder(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not autoresponders:
-            await interaction.response.send_message("No autoresponders to delete.", ephemeral=True)
-            return
+    async def show(self, interaction):
+        self.refresh()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+    
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.gray, emoji="◀️", row=0)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(self.page - 1, 0)
+        await self.show(interaction)
+    
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.gray, emoji="▶️", row=0)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.show(interaction)
+    
+    @discord.ui.button(label="Search", style=discord.ButtonStyle.blurple, emoji="🔍", row=0)
+    async def search(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(AutoresponderSearchModal(self))
+
+class AutoresponderSearchModal(discord.ui.Modal):
+    def __init__(self, browser):
+        super().__init__(title="Search Autoresponders")
+        self.browser = browser
         
-        select = DeleteAutoresponderSelect()
-        view = discord.ui.View()
-        view.add_item(select)
-        await interaction.response.send_message("Select an autoresponder to delete:", view=view, ephemeral=True)
+        self.query = discord.ui.TextInput(
+            label="Trigger contains",
+            placeholder="Leave empty to show every autoresponder",
+            default=browser.query,
+            required=False,
+            max_length=100
+        )
+        self.add_item(self.query)
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        self.browser.query = self.query.value.strip().lower()
+        self.browser.page = 0
+        await self.browser.show(interaction)
 
 class EditAutoresponderSelect(discord.ui.Select):
-    def __init__(self):
+    def __init__(self, state, triggers):
         options = [
-            discord.SelectOption(label=trigger, description=f"Edit: {data['response'][:50]}{'...' if len(data['response']) > 50 else ''}")
-            for trigger, data in autoresponders.items()
+            discord.SelectOption(label=trigger, value=trigger, description=f"Edit: {state.autoresponders[trigger]['response'][:50]}{'...' if len(state.autoresponders[trigger]['response']) > 50 else ''}")
+            for trigger in triggers
         ]
-        super().__init__(placeholder="Choose an autoresponder to edit...", options=options[:25])
+        super().__init__(placeholder="Choose an autoresponder to edit...", options=options, row=1)
+        self.state = state
     
     async def callback(self, interaction: discord.Interaction):
         trigger = self.values[0]
-        if trigger in autoresponders:
-            modal = EditAutoresponderModal(trigger, autoresponders[trigger])
+        if trigger in self.state.autoresponders:
+            modal = EditAutoresponderModal(self.state, trigger, self.state.autoresponders[trigger])
             await interaction.response.send_modal(modal)
         else:
             await interaction.response.send_message("Autoresponder not found.", ephemeral=True)
 
 class EditAutoresponderModal(discord.ui.Modal):
-    def __init__(self, trigger, data):
+    def __init__(self, state, trigger, data):
         super().__init__(title=f"Edit Autoresponder: {trigger}")
+        self.state = state
         self.original_trigger = trigger
         
         self.trigger = discord.ui.TextInput(
             label="Trigger Word/Phrase",
+            placeholder="Text to find, or mode:pattern with exact, word, prefix, glob or regex",
             default=trigger,
             max_length=100
         )
@@ -1074,9 +2828,9 @@ class EditAutoresponderModal(discord.ui.Modal):
         )
         
         self.cooldown = discord.ui.TextInput(
-            label="Cooldown (seconds)",
-            default=str(data['cooldown']),
-            max_length=10
+            label="Cooldown (seconds, optional scope)",
+            default=str(data['cooldown']) if data.get('cooldown_scope', 'global') == 'global' else f"{data['cooldown']} {data['cooldown_scope'].replace('_', '+')}",
+            max_length=30
         )
         
         self.allowed_roles = discord.ui.TextInput(
@@ -1100,31 +2854,46 @@ class EditAutoresponderModal(discord.ui.Modal):
         self.add_item(self.embed_title)
     
     async def on_submit(self, interaction: discord.Interaction):
+        trigger = normalize_trigger(self.trigger.value)
+        problem = trigger_problem(trigger)
+        if problem:
+            await interaction.response.send_message(problem, ephemeral=True)
+            return
+        
         try:
-            cooldown_time = int(self.cooldown.value)
+            cooldown_time, cooldown_scope = parse_cooldown(self.cooldown.value)
         except ValueError:
-            await interaction.response.send_message("Invalid cooldown value. Please enter a number.", ephemeral=True)
+            await interaction.response.send_message("Invalid cooldown value. Enter seconds, optionally followed by global, guild, channel, user or member+channel.", ephemeral=True)
             return
         
         roles_list = []
+        role_ids = []
         if self.allowed_roles.value:
-            roles_list = [role.strip() for role in self.allowed_roles.value.split(',')]
+            role_ids, unknown_roles = resolve_roles(interaction.guild, [role for role in self.allowed_roles.value.split(',') if role.strip()])
+            if unknown_roles:
+                await interaction.response.send_message(f"Unknown roles: {', '.join(unknown_roles)}", ephemeral=True)
+                return
+            roles_list = [interaction.guild.get_role(role_id).name for role_id in role_ids]
         
         is_embed = bool(self.embed_title.value)
         
         # Remove old trigger if it changed
-        if self.original_trigger != self.trigger.value.lower():
-            if self.original_trigger in autoresponders:
-                del autoresponders[self.original_trigger]
+        if self.original_trigger != trigger:
+            if self.original_trigger in self.state.autoresponders:
+                del self.state.autoresponders[self.original_trigger]
+                self.state.forget('autoresponders', self.original_trigger)
         
-        autoresponders[self.trigger.value.lower()] = {
+        self.state.autoresponders[trigger] = {
             'response': self.response.value,
             'cooldown': cooldown_time,
+            'cooldown_scope': cooldown_scope,
             'allowed_roles': roles_list,
+            'allowed_role_ids': role_ids,
             'is_embed': is_embed,
-            'embed_title': self.embed_title.value,
-            'last_used': 0
+            'embed_title': self.embed_title.value
         }
+        self.state.persist('autoresponders', trigger, self.state.autoresponders[trigger])
+        self.state.rebuild_trigger_matcher()
         
         embed = discord.Embed(
             title="Autoresponder Updated",
@@ -1134,48 +2903,31 @@ class EditAutoresponderModal(discord.ui.Modal):
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 class AutoresponderView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(timeout=300)
+        self.state = state
     
     @discord.ui.button(label="Create Autoresponder", style=discord.ButtonStyle.green, emoji="➕")
     async def create_autoresponder(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = CreateAutoresponderModal()
+        modal = CreateAutoresponderModal(self.state)
         await interaction.response.send_modal(modal)
     
     @discord.ui.button(label="List Autoresponders", style=discord.ButtonStyle.blurple, emoji="📋")
     async def list_autoresponders(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not autoresponders:
-            await interaction.response.send_message("No autoresponders configured.", ephemeral=True)
-            return
-        
-        embed = discord.Embed(title="Autoresponders", color=0x00ff00)
-        for trigger, data in autoresponders.items():
-            value = f"Response: {data['response'][:50]}{'...' if len(data['response']) > 50 else ''}\n"
-            value += f"Type: {'Embed' if data['is_embed'] else 'Normal'}\n"
-            value += f"Cooldown: {data['cooldown']}s\n"
-            value += f"Roles: {', '.join(data['allowed_roles']) if data['allowed_roles'] else 'All'}"
-            embed.add_field(name=trigger, value=value, inline=False)
-        
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await open_autoresponder_browser(interaction, self.state, "No autoresponders configured.")
     
     @discord.ui.button(label="Delete Autoresponder", style=discord.ButtonStyle.red, emoji="🗑️")
     async def delete_autoresponder(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not autoresponders:
-            await interaction.response.send_message("No autoresponders to delete.", ephemeral=True)
-            return
-        
-        select = DeleteAutoresponderSelect()
-        view = discord.ui.View()
-        view.add_item(select)
-        await interaction.response.send_message("Select an autoresponder to delete:", view=view, ephemeral=True)
+        await open_autoresponder_browser(interaction, self.state, "No autoresponders to delete.")
 
 class CreateAutoresponderModal(discord.ui.Modal):
-    def __init__(self):
+    def __init__(self, state):
         super().__init__(title="Create Autoresponder")
+        self.state = state
     
     trigger = discord.ui.TextInput(
         label="Trigger Word/Phrase",
-        placeholder="Enter the trigger that will activate this autoresponder...",
+        placeholder="Text to find, or mode:pattern with exact, word, prefix, glob or regex",
         max_length=100
     )
     
@@ -1187,10 +2939,10 @@ class CreateAutoresponderModal(discord.ui.Modal):
     )
     
     cooldown = discord.ui.TextInput(
-        label="Cooldown (seconds)",
-        placeholder="Enter cooldown time in seconds (0 for no cooldown)",
+        label="Cooldown (seconds, optional scope)",
+        placeholder="Seconds, optionally with a scope: 30 user, 10 channel, 5 member+channel",
         default="0",
-        max_length=10
+        max_length=30
     )
     
     allowed_roles = discord.ui.TextInput(
@@ -1208,26 +2960,40 @@ class CreateAutoresponderModal(discord.ui.Modal):
     )
     
     async def on_submit(self, interaction: discord.Interaction):
+        trigger = normalize_trigger(self.trigger.value)
+        problem = trigger_problem(trigger)
+        if problem:
+            await interaction.response.send_message(problem, ephemeral=True)
+            return
+        
         try:
-            cooldown_time = int(self.cooldown.value)
+            cooldown_time, cooldown_scope = parse_cooldown(self.cooldown.value)
         except ValueError:
-            await interaction.response.send_message("Invalid cooldown value. Please enter a number.", ephemeral=True)
+            await interaction.response.send_message("Invalid cooldown value. Enter seconds, optionally followed by global, guild, channel, user or member+channel.", ephemeral=True)
             return
         
         roles_list = []
+        role_ids = []
         if self.allowed_roles.value:
-            roles_list = [role.strip() for role in self.allowed_roles.value.split(',')]
+            role_ids, unknown_roles = resolve_roles(interaction.guild, [role for role in self.allowed_roles.value.split(',') if role.strip()])
+            if unknown_roles:
+                await interaction.response.send_message(f"Unknown roles: {', '.join(unknown_roles)}", ephemeral=True)
+                return
+            roles_list = [interaction.guild.get_role(role_id).name for role_id in role_ids]
         
         is_embed = bool(self.embed_title.value)
         
-        autoresponders[self.trigger.value.lower()] = {
+        self.state.autoresponders[trigger] = {
             'response': self.response.value,
             'cooldown': cooldown_time,
+            'cooldown_scope': cooldown_scope,
             'allowed_roles': roles_list,
+            'allowed_role_ids': role_ids,
             'is_embed': is_embed,
-            'embed_title': self.embed_title.value,
-            'last_used': 0
+            'embed_title': self.embed_title.value
         }
+        self.state.persist('autoresponders', trigger, self.state.autoresponders[trigger])
+        self.state.rebuild_trigger_matcher()
         
         embed = discord.Embed(
             title="Autoresponder Created",
@@ -1235,25 +3001,31 @@ class CreateAutoresponderModal(discord.ui.Modal):
             color=0x00ff00
         )
         embed.add_field(name="Response", value=self.response.value[:100] + ('...' if len(self.response.value) > 100 else ''), inline=False)
-        embed.add_field(name="Cooldown", value=f"{cooldown_time} seconds", inline=True)
+        embed.add_field(name="Cooldown", value=format_cooldown(self.state.autoresponders[trigger]), inline=True)
         embed.add_field(name="Type", value="Embed" if is_embed else "Normal", inline=True)
         embed.add_field(name="Allowed Roles", value=', '.join(roles_list) if roles_list else "All", inline=True)
         
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 class DeleteAutoresponderSelect(discord.ui.Select):
-    def __init__(self):
+    def __init__(self, state, triggers):
         options = [
-            discord.SelectOption(label=trigger, description=f"Response: {data['response'][:50]}{'...' if len(data['response']) > 50 else ''}")
-            for trigger, data in autoresponders.items()
+            discord.SelectOption(label=trigger, value=trigger, description=f"Response: {state.autoresponders[trigger]['response'][:50]}{'...' if len(state.autoresponders[trigger]['response']) > 50 else ''}")
+            for trigger in triggers
         ]
-        super().__init__(placeholder="Choose an autoresponder to delete...", options=options[:25])
+        super().__init__(placeholder="Choose an autoresponder to delete...", options=options, row=2)
+        self.state = state
     
     async def callback(self, interaction: discord.Interaction):
         trigger = self.values[0]
-        if trigger in autoresponders:
-            del autoresponders[trigger]
-            await interaction.response.send_message(f"Deleted autoresponder for trigger: `{trigger}`", ephemeral=True)
+        if trigger in self.state.autoresponders:
+            del self.state.autoresponders[trigger]
+            self.state.forget('autoresponders', trigger)
+            self.state.rebuild_trigger_matcher()
+            
+            # Redraw the browser page the menu came from so the deleted entry disappears
+            self.view.refresh()
+            await interaction.response.edit_message(content=f"Deleted autoresponder for trigger: `{trigger}`", embed=self.view.render(), view=self.view)
         else:
             await interaction.response.send_message("Autoresponder not found.", ephemeral=True)
 
@@ -1308,12 +3080,14 @@ class AuctionChannelModal(discord.ui.Modal):
                 return
             
             auction_settings['channel_id'] = channel_id
+            storage.put('auction_settings', 'channel_id', channel_id)
             
             if self.forum_channel_id.value:
                 forum_id = int(self.forum_channel_id.value)
                 forum_channel = bot.get_channel(forum_id)
                 if forum_channel:
                     auction_settings['forum_channel_id'] = forum_id
+                    storage.put('auction_settings', 'forum_channel_id', forum_id)
             
             embed = discord.Embed(
                 title="Auction Channel Set",
@@ -1337,6 +3111,7 @@ class FormatSelect(discord.ui.Select):
     async def callback(self, interaction: discord.Interaction):
         format_value = self.values[0].lower()
         auction_settings['format'] = format_value
+        storage.put('auction_settings', 'format', format_value)
         await interaction.response.send_message(f"Auction format set to: **{format_value.title()}**", ephemeral=True)
 
 class AuctionCreateModal(discord.ui.Modal):
@@ -1544,13 +3319,10 @@ class AuctionOptionsView(discord.ui.View):
                 message = await channel.send(embed=embed)
                 thread = await message.create_thread(name=self.auction_data['title'])
                 
-                # Download and post images in thread if provided
+                # Download and post images in thread if provided; the queue keeps them in order
                 if self.auction_data['images']:
                     for i, image_url in enumerate(self.auction_data['images'][:10]):  # Limit to 10
-                        image_data = await download_image(image_url)
-                        if image_data:
-                            file = discord.File(io.BytesIO(image_data), filename=f"auction_image_{i+1}.png")
-                            await thread.send(file=file)
+                        send_queue.enqueue(thread, image_payload(image_url, f"auction_image_{i+1}.png"))
                 
                 await interaction.response.send_message(f"Auction created successfully! Check {thread.mention}", ephemeral=True)
                 
@@ -1565,10 +3337,7 @@ class AuctionOptionsView(discord.ui.View):
                     
                     if self.auction_data['images']:
                         for i, image_url in enumerate(self.auction_data['images'][:10]):
-                            image_data = await download_image(image_url)
-                            if image_data:
-                                file = discord.File(io.BytesIO(image_data), filename=f"auction_image_{i+1}.png")
-                                await thread.thread.send(file=file)
+                            send_queue.enqueue(thread.thread, image_payload(image_url, f"auction_image_{i+1}.png"))
                     
                     await interaction.response.send_message(f"Auction forum post created successfully! Check {thread.thread.mention}", ephemeral=True)
                 else:
@@ -1578,10 +3347,7 @@ class AuctionOptionsView(discord.ui.View):
                 
                 if self.auction_data['images']:
                     for i, image_url in enumerate(self.auction_data['images'][:10]):
-                        image_data = await download_image(image_url)
-                        if image_data:
-                            file = discord.File(io.BytesIO(image_data), filename=f"auction_image_{i+1}.png")
-                            await channel.send(file=file)
+                        send_queue.enqueue(channel, image_payload(image_url, f"auction_image_{i+1}.png"))
                 
                 await interaction.response.send_message(f"Auction posted successfully in {channel.mention}", ephemeral=True)
                 
@@ -1651,68 +3417,112 @@ class AuctionImagesModal(discord.ui.Modal):
         self.auction_data['images'] = image_urls[:10]  # Limit to 10 images
         await interaction.response.send_message(f"Added {len(self.auction_data['images'])} image(s)", ephemeral=True)
 
-async def update_boost_roles(member, boost_count):
+def update_boost_roles(state, member, boost_count):
     """Update roles based on boost count"""
-    if not boost_settings['roles']:
+    if not state.boost_roles:
         return
     
-    try:
-        # Remove all boost roles first
-        roles_to_remove = []
-        for role_id in boost_settings['roles'].values():
-            role = member.guild.get_role(role_id)
-            if role and role in member.roles:
-                roles_to_remove.append(role)
-        
-        if roles_to_remove:
-            await member.remove_roles(*roles_to_remove, reason="Boost role update")
-        
-        # Add appropriate role
-        for required_boosts, role_id in sorted(boost_settings['roles'].items(), reverse=True):
-            if boost_count >= required_boosts:
-                role = member.guild.get_role(role_id)
-                if role:
-                    await member.add_roles(role, reason=f"Earned {boost_count} boosts")
-                    break
-    except discord.Forbidden:
-        print(f"Missing permissions to manage roles for {member.display_name}")
-    except discord.HTTPException as e:
-        print(f"HTTP error updating boost roles for {member.display_name}: {e}")
-    except Exception as e:
-        print(f"Error updating boost roles for {member.display_name}: {e}")
+    reconcile_ladder_roles(member, state.boost_ladder, boost_count, f"Earned {boost_count} boosts")
 
-async def update_invite_roles(member, invite_count):
+def update_invite_roles(state, member, invite_count):
     """Update roles based on invite count"""
-    if not invite_settings['roles']:
+    if not state.invite_roles:
         return
     
-    try:
-        # Remove all invite roles first
-        roles_to_remove = []
-        for role_id in invite_settings['roles'].values():
-            role = member.guild.get_role(role_id)
-            if role and role in member.roles:
-                roles_to_remove.append(role)
-        
-        if roles_to_remove:
-            await member.remove_roles(*roles_to_remove, reason="Invite role update")
-        
-        # Add appropriate role
-        for required_invites, role_id in sorted(invite_settings['roles'].items(), reverse=True):
-            if invite_count >= required_invites:
-                role = member.guild.get_role(role_id)
-                if role:
-                    await member.add_roles(role, reason=f"Earned {invite_count} invites")
-                    break
-    except discord.Forbidden:
-        print(f"Missing permissions to manage roles for {member.display_name}")
-    except discord.HTTPException as e:
-        print(f"HTTP error updating invite roles for {member.display_name}: {e}")
-    except Exception as e:
-        print(f"Error updating invite roles for {member.display_name}: {e}")
+    reconcile_ladder_roles(member, state.invite_ladder, invite_count, f"Earned {invite_count} invites")
+
+def invite_cache_entry(invite):
+    """Reduce an invite to what join attribution needs"""
+    return {
+        'uses': invite.uses or 0,
+        'inviter_id': invite.inviter.id if invite.inviter else None,
+        'max_uses': invite.max_uses or 0
+    }
+
+async def fetch_invite_snapshot(guild):
+    """Fetch current invite and vanity URL use counts for a guild"""
+    invites = await guild.invites()
+    
+    vanity_uses = None
+    if 'VANITY_URL' in guild.features:
+        try:
+            vanity = await guild.vanity_invite()
+            vanity_uses = vanity.uses if vanity else None
+        except discord.HTTPException:
+            pass
+    
+    return {invite.code: invite_cache_entry(invite) for invite in invites}, vanity_uses
+
+async def credit_inviter(state, member, inviter_id):
+    """Record that inviter_id brought member into the guild"""
+    if inviter_id not in state.invite_tracking:
+        state.invite_tracking[inviter_id] = {'invites': 0, 'invited_users': []}
+    
+    invited_user = {
+        'user_id': member.id,
+        'username': str(member),
+        'joined_at': datetime.now().isoformat()
+    }
+    state.invite_tracking[inviter_id]['invites'] += 1
+    state.invite_tracking[inviter_id]['invited_users'].append(invited_user)
+    state.invitee_index[member.id] = (inviter_id, invited_user)
+    state.persist('invite_tracking', inviter_id, state.invite_tracking[inviter_id])
+    
+    # Update roles for inviter
+    inviter = await resolve_member(member.guild, inviter_id)
+    if inviter:
+        update_invite_roles(state, inviter, state.invite_tracking[inviter_id]['invites'])
+
+async def process_pending_joins(guild, state):
+    """Attribute every join gathered during the window with a single invite fetch"""
+    while state.pending_joins:
+        await asyncio.sleep(INVITE_JOIN_WINDOW)
+        joins, state.pending_joins = state.pending_joins, []
+        
+        try:
+            invites, vanity_uses = await fetch_invite_snapshot(guild)
+        except discord.Forbidden:
+            print(f"Missing permissions to track invites in {guild.name}")
+            continue
+        except Exception as e:
+            print(f"Error fetching invites for {guild.name}: {e}")
+            continue
+        
+        # One slot per observed use; vanity joins take a slot with no inviter
+        now = time.monotonic()
+        slots = [slot for slot in state.unclaimed_invite_uses if now - slot[1] <= INVITE_SLOT_TTL]
+        for code, entry in invites.items():
+            previous = state.invite_cache.get(code)
+            if previous is None:
+                continue  # never seen before, so its count is a baseline rather than new uses
+            slots.extend([(entry['inviter_id'], now)] * max(entry['uses'] - previous['uses'], 0))
+        if vanity_uses is not None and state.vanity_uses is not None:
+            slots.extend([(None, now)] * max(vanity_uses - state.vanity_uses, 0))
+        
+        # Invites that vanished are either revoked or used up; only fall back to
+        # them for joins the remaining invites can't explain
+        for code, entry in state.invite_cache.items():
+            if len(slots) >= len(joins):
+                break
+            if code not in invites and entry['max_uses']:
+                slots.extend([(entry['inviter_id'], now)] * max(entry['max_uses'] - entry['uses'], 0))
+        
+        state.invite_cache = invites
+        state.vanity_uses = vanity_uses
+        
+        # Uses counted by the API before their join event arrived belong to the next batch
+        state.unclaimed_invite_uses = slots[len(joins):len(joins) + INVITE_SLOT_LIMIT]
+        
+        for member, (inviter_id, _) in zip(joins, slots):
+            if inviter_id:
+                try:
+                    await credit_inviter(state, member, inviter_id)
+                except Exception as e:
+                    print(f"Error tracking member join for {member.display_name}: {e}")
 
 async def track_guild_boosts(guild):
     """Track total boosts for a guild and update all members accordingly"""
+    state = get_guild_state(guild.id)
     try:
         current_boosters = [member for member in guild.members if member.premium_since]
         
@@ -1720,8 +3530,8 @@ async def track_guild_boosts(guild):
         for member in current_boosters:
             try:
                 user_id = member.id
-                if user_id not in boost_settings['tracking']:
-                    boost_settings['tracking'][user_id] = {
+                if user_id not in state.boost_tracking:
+                    state.boost_tracking[user_id] = {
                         'boosts': 1,
                         'boost_history': [{
                             'action': 'initial_boost',
@@ -1729,19 +3539,43 @@ async def track_guild_boosts(guild):
                         }],
                         'current_boost_start': member.premium_since.isoformat() if member.premium_since else None
                     }
-                elif not boost_settings['tracking'][user_id].get('current_boost_start'):
+                    state.persist('boost_tracking', user_id, state.boost_tracking[user_id])
+                elif not state.boost_tracking[user_id].get('current_boost_start'):
                     # User is boosting but we don't have a start time
-                    boost_settings['tracking'][user_id]['current_boost_start'] = member.premium_since.isoformat() if member.premium_since else None
+                    state.boost_tracking[user_id]['current_boost_start'] = member.premium_since.isoformat() if member.premium_since else None
+                    state.persist('boost_tracking', user_id, state.boost_tracking[user_id])
                 
                 # Update roles
-                boost_count = boost_settings['tracking'][user_id]['boosts']
-                await update_boost_roles(member, boost_count)
+                boost_count = state.boost_tracking[user_id]['boosts']
+                update_boost_roles(state, member, boost_count)
             except Exception as e:
                 print(f"Error tracking boosts for member {member.id}: {e}")
                 continue
     except Exception as e:
         print(f"Error tracking guild boosts for {guild.name}: {e}")
 
+@bot.event
+async def setup_hook():
+    load_state()
+    restore_role_panels()
+    flush_storage.start()
+    flush_trigger_stats.start()
+    role_queue.start()
+
+@tasks.loop(seconds=STORAGE_FLUSH_INTERVAL)
+async def flush_storage():
+    """Write state changes queued since the last tick in one batch"""
+    try:
+        await storage.flush()
+    except Exception as e:
+        print(f"Error flushing state to {storage.path}: {e}")
+
+@tasks.loop(seconds=STATS_FLUSH_INTERVAL)
+async def flush_trigger_stats():
+    """Hand autoresponder counters to storage; hot-path increments never touch it directly"""
+    for state in guild_states.values():
+        state.persist_trigger_stats()
+
 @bot.event
 async def on_ready():
     print(f'{bot.user} has connected to Discord!')
@@ -1756,205 +3590,348 @@ async def on_ready():
     else:
         print("Bot will work in all servers (no guild restrictions)")
     
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} command(s)")
+    async with startup_lock:
+        await run_startup()
+
+def command_tree_fingerprint():
+    """Stable hash of every registered command's payload and checks"""
+    commands_data = [
+        {
+            'command': command.to_dict(bot.tree),
+            'checks': [check.__qualname__ for check in getattr(command, 'checks', [])]
+        }
+        for command in sorted(bot.tree.get_commands(), key=lambda command: command.name)
+    ]
+    return hashlib.sha256(json.dumps(commands_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+async def sync_command_tree():
+    """Sync application commands when they changed since the last sync; reconnects reuse the first result"""
+    if startup_state['tree_synced']:
+        return
+    
+    fingerprint = command_tree_fingerprint()
+    
+    # Development mode syncs straight to the allowed guilds, where updates show up immediately
+    if SYNC_TO_GUILDS and ALLOWED_GUILD_IDS:
+        targets = [discord.Object(id=guild_id) for guild_id in ALLOWED_GUILD_IDS]
+    else:
+        targets = [None]
+    
+    failed = False
+    for guild in targets:
+        scope = guild.id if guild else 0
+        where = f"guild {guild.id}" if guild else "global"
         
-        # Cache invites for tracking
-        for guild in bot.guilds:
-            try:
-                invites = await guild.invites()
-                invite_settings['invite_cache'][guild.id] = {invite.code: invite.uses for invite in invites}
-                
-                # Initialize boost tracking for the guild
-                await track_guild_boosts(guild)
-                
-            except:
-                pass
-    except Exception as e:
-        print(f"Failed to sync commands: {e}")
+        if not FORCE_COMMAND_SYNC and storage.load('meta', scope).get('command_tree_hash') == fingerprint:
+            print(f"Command tree unchanged ({where}), skipping sync")
+            continue
+        
+        try:
+            if guild:
+                bot.tree.copy_global_to(guild=guild)
+            synced = await bot.tree.sync(guild=guild)
+            storage.put('meta', 'command_tree_hash', fingerprint, scope=scope)
+            print(f"Synced {len(synced)} command(s) ({where})")
+        except Exception as e:
+            failed = True
+            print(f"Failed to sync commands ({where}): {e}")
+    
+    # A failed sync is retried on the next on_ready; targets that already synced are skipped by their hash
+    startup_state['tree_synced'] = not failed
+
+async def warm_guild(guild, semaphore):
+    """Cache invites and reconcile boosts for one guild, skipping work a reconnect doesn't need"""
+    async with semaphore:
+        state = get_guild_state(guild.id)
+        state.invite_cache, state.vanity_uses = await fetch_invite_snapshot(guild)
+        state.unclaimed_invite_uses = []  # measured against the old snapshot
+        
+        # Boosts that changed while disconnected show up as a different server boost count
+        if not LOW_MEMORY_MODE and startup_state['boost_counts'].get(guild.id) != guild.premium_subscription_count:
+            await track_guild_boosts(guild)
+            startup_state['boost_counts'][guild.id] = guild.premium_subscription_count
+
+async def run_startup():
+    """Sync commands, then warm every guild concurrently, logging how long each stage took"""
+    startup_state['ready_count'] += 1
+    reconnect = startup_state['ready_count'] > 1
+    
+    stage_start = time.monotonic()
+    await sync_command_tree()
+    sync_time = time.monotonic() - stage_start
+    
+    stage_start = time.monotonic()
+    guilds = list(bot.guilds)
+    semaphore = asyncio.Semaphore(STARTUP_CONCURRENCY)
+    results = await asyncio.gather(*(warm_guild(guild, semaphore) for guild in guilds), return_exceptions=True)
+    
+    failed = 0
+    for guild, result in zip(guilds, results):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"Startup warmup failed for {guild.name}: {result}")
+    warmup_time = time.monotonic() - stage_start
+    
+    label = f"Resync #{startup_state['ready_count'] - 1}" if reconnect else "Startup"
+    print(
+        f"{label}: command sync {sync_time:.2f}s, "
+        f"warmup {len(guilds) - failed}/{len(guilds)} guilds {warmup_time:.2f}s, "
+        f"{time.monotonic() - PROCESS_START:.2f}s since process start"
+    )
 
 @bot.event
 async def on_message(message):
-    if message.author == bot.user:
+    if message.author == bot.user or message.guild is None:
         return
     
-    content = message.content.lower()
+    # Cheap gates first so most messages never reach the matcher
+    if message.author.bot or message.webhook_id:
+        prefilter_stats['bot_or_webhook'] += 1
+        return
     
-    for trigger, data in autoresponders.items():
-        if trigger in content:
-            # Check cooldown
-            current_time = time.time()
-            if current_time - data['last_used'] < data['cooldown']:
-                continue
-            
-            # Check roles
-            if data['allowed_roles']:
-                user_roles = [role.name for role in message.author.roles]
-                if not any(role in user_roles for role in data['allowed_roles']):
-                    continue
-            
-            # Send response
-            if data['is_embed'] and data['embed_title']:
-                embed = discord.Embed(
-                    title=data['embed_title'],
-                    description=data['response'],
-                    color=0x0099ff
-                )
-                await message.channel.send(embed=embed)
-            else:
-                await message.channel.send(data['response'])
-            
-            # Update last used time
-            autoresponders[trigger]['last_used'] = current_time
-            break
+    state = get_guild_state(message.guild.id)
+    if not state.trigger_matcher.order:
+        prefilter_stats['no_autoresponders'] += 1
+        return
+    
+    channel_id = message.channel.id
+    parent_id = getattr(message.channel, 'parent_id', None)  # threads follow their parent channel's settings
+    if (
+        channel_id in state.channel_deny or parent_id in state.channel_deny
+        or (state.channel_allow and channel_id not in state.channel_allow and parent_id not in state.channel_allow)
+    ):
+        prefilter_stats['channel'] += 1
+        return
+    
+    if not message.content:
+        prefilter_stats['too_short'] += 1
+        return
+    
+    # Measured on the normalized text, since NFKC can lengthen it as well as shorten it
+    match_start = time.perf_counter()
+    content = normalize_text(message.content)
+    if len(content) < state.trigger_matcher.min_length:
+        prefilter_stats['too_short'] += 1
+        return
+    
+    prefilter_stats['evaluated'] += 1
+    # Matches come back in autoresponder order, so the first eligible one still wins
+    engine = state.trigger_matcher
+    matches = await engine.find_all_with_patterns(content)
+    state.record_match_latency(time.perf_counter() - match_start)
+    if engine.slow:
+        state.disable_slow_rules(engine)
+    # Regex triggers are awaited, so the autoresponder set may have changed in the meantime
+    matches = [trigger for trigger in matches if trigger in state.autoresponders]
+    
+    for trigger in matches:
+        state.count_trigger(trigger, 0)
+    
+    for trigger in matches:
+        data = state.autoresponders[trigger]
+        # Check cooldown
+        current_time = time.monotonic()
+        bucket = cooldown_key(trigger, data.get('cooldown_scope', 'global'), message)
+        if state.cooldowns.active(bucket, current_time):
+            state.count_trigger(trigger, 1)
+            continue
+        
+        # Check roles
+        if not state.autoresponder_allowed(trigger, message.author):
+            state.count_trigger(trigger, 2)
+            continue
+        
+        # Send response
+        response = state.prepared_responses[trigger]
+        uses = data.get('uses', 0) + 1 if response.uses_count else data.get('uses', 0)
+        payload, dedupe_key = response.keyed_payload(trigger, message.author, message.channel, uses)
+        if not send_queue.enqueue(message.channel, payload, dedupe_key=dedupe_key):
+            break  # the same reply is already waiting, so this message is answered without using a cooldown
+        if response.uses_count:
+            data['uses'] = uses
+            state.persist('autoresponders', trigger, data)
+        
+        # Start this bucket's cooldown
+        state.cooldowns.start(bucket, data['cooldown'], current_time)
+        state.count_trigger(trigger, 3)
+        break
 
 @bot.event
 async def on_raw_reaction_add(payload):
-    if payload.user_id == bot.user.id:
+    # Most reactions are on unwatched messages, so this lookup comes before anything else
+    config = reaction_roles.get(payload.message_id)
+    if config is None:
         return
     
-    if payload.message_id in reaction_roles:
-        guild = bot.get_guild(payload.guild_id)
-        member = guild.get_member(payload.user_id)
-        emoji = str(payload.emoji)
-        
-        if emoji in reaction_roles[payload.message_id]:
-            role_id = reaction_roles[payload.message_id][emoji]
-            role = guild.get_role(role_id)
-            
-            if role and member:
-                if role in member.roles:
-                    await member.remove_roles(role)
-                else:
-                    await member.add_roles(role)
+    role_id = config['roles'].get(payload.emoji.id or payload.emoji.name)
+    if role_id is None or payload.user_id == bot.user.id:
+        return
+    
+    guild = bot.get_guild(payload.guild_id)
+    member = payload.member or guild.get_member(payload.user_id)
+    role = guild.get_role(role_id)
+    
+    if role and member:
+        member_cache.remember(member)  # removals carry no member, so keep this one for them
+        reaction_debouncer.add(member, payload.message_id, role_id, True)
 
 @bot.event
 async def on_raw_reaction_remove(payload):
-    if payload.user_id == bot.user.id:
+    config = reaction_roles.get(payload.message_id)
+    if config is None:
         return
     
-    if payload.message_id in reaction_roles:
-        guild = bot.get_guild(payload.guild_id)
-        member = guild.get_member(payload.user_id)
-        emoji = str(payload.emoji)
-        
-        if emoji in reaction_roles[payload.message_id]:
-            role_id = reaction_roles[payload.message_id][emoji]
-            role = guild.get_role(role_id)
-            
-            if role and member and role in member.roles:
-                await member.remove_roles(role)
+    role_id = config['roles'].get(payload.emoji.id or payload.emoji.name)
+    if role_id is None or payload.user_id == bot.user.id:
+        return
+    
+    guild = bot.get_guild(payload.guild_id)
+    role = guild.get_role(role_id)
+    if not role:
+        return
+    
+    member = await resolve_member(guild, payload.user_id)
+    if member:
+        reaction_debouncer.add(member, payload.message_id, role_id, False)
 
 @bot.event
 async def on_member_update(before, after):
+    state = get_guild_state(after.guild.id)
+    
     # Track boosts
     if before.premium_since != after.premium_since:
         user_id = after.id
         
-        if user_id not in boost_settings['tracking']:
-            boost_settings['tracking'][user_id] = {'boosts': 0, 'boost_history': [], 'current_boost_start': None}
+        if user_id not in state.boost_tracking:
+            state.boost_tracking[user_id] = {'boosts': 0, 'boost_history': [], 'current_boost_start': None}
         
         if after.premium_since and not before.premium_since:
             # User started boosting
-            boost_settings['tracking'][user_id]['boosts'] += 1
-            boost_settings['tracking'][user_id]['current_boost_start'] = after.premium_since.isoformat()
-            boost_settings['tracking'][user_id]['boost_history'].append({
+            state.boost_tracking[user_id]['boosts'] += 1
+            state.boost_tracking[user_id]['current_boost_start'] = after.premium_since.isoformat()
+            state.boost_tracking[user_id]['boost_history'].append({
                 'action': 'boost_start',
                 'timestamp': datetime.now().isoformat(),
                 'boost_start': after.premium_since.isoformat()
             })
         elif before.premium_since and not after.premium_since:
             # User stopped boosting - but keep their boost count for rewards
-            boost_settings['tracking'][user_id]['current_boost_start'] = None
-            boost_settings['tracking'][user_id]['boost_history'].append({
+            state.boost_tracking[user_id]['current_boost_start'] = None
+            state.boost_tracking[user_id]['boost_history'].append({
                 'action': 'boost_end',
                 'timestamp': datetime.now().isoformat(),
                 'boost_end': before.premium_since.isoformat() if before.premium_since else None
             })
             # Note: We don't decrement the boost count to maintain lifetime boost tracking
+        state.persist('boost_tracking', user_id, state.boost_tracking[user_id])
         
         # Update roles based on total accumulated boosts
-        boost_count = boost_settings['tracking'][user_id]['boosts']
-        await update_boost_roles(after, boost_count)
+        boost_count = state.boost_tracking[user_id]['boosts']
+        update_boost_roles(state, after, boost_count)
 
 @bot.event
 async def on_member_join(member):
-    # Check which invite was used
+    state = get_guild_state(member.guild.id)
+    
+    # Joins are attributed in batches so a join burst costs one invite fetch
+    state.pending_joins.append(member)
+    if state.invite_refresh is None or state.invite_refresh.done():
+        state.invite_refresh = asyncio.create_task(process_pending_joins(member.guild, state))
+
+@bot.event
+async def on_guild_join(guild):
+    # Without a snapshot the first join would have nothing to compare invite counts against
     try:
-        invites_before = invite_settings['invite_cache'].get(member.guild.id, {})
-        invites_after = await member.guild.invites()
-        
-        for invite in invites_after:
-            if invite.code in invites_before:
-                if invite.uses > invites_before[invite.code]:
-                    # This invite was used
-                    if invite.inviter:  # Check if inviter exists
-                        inviter_id = invite.inviter.id
-                        
-                        if inviter_id not in invite_settings['tracking']:
-                            invite_settings['tracking'][inviter_id] = {'invites': 0, 'invited_users': []}
-                        
-                        invite_settings['tracking'][inviter_id]['invites'] += 1
-                        invite_settings['tracking'][inviter_id]['invited_users'].append({
-                            'user_id': member.id,
-                            'username': str(member),
-                            'joined_at': datetime.now().isoformat()
-                        })
-                        
-                        # Update invite cache
-                        if member.guild.id not in invite_settings['invite_cache']:
-                            invite_settings['invite_cache'][member.guild.id] = {}
-                        invite_settings['invite_cache'][member.guild.id][invite.code] = invite.uses
-                        
-                        # Update roles for inviter
-                        inviter = member.guild.get_member(inviter_id)
-                        if inviter:
-                            invite_count = invite_settings['tracking'][inviter_id]['invites']
-                            await update_invite_roles(inviter, invite_count)
-                    
-                    break
-            else:
-                # New invite
-                if member.guild.id not in invite_settings['invite_cache']:
-                    invite_settings['invite_cache'][member.guild.id] = {}
-                invite_settings['invite_cache'][member.guild.id][invite.code] = invite.uses
-        
-        # Update cache with current invites
-        invite_settings['invite_cache'][member.guild.id] = {invite.code: invite.uses for invite in invites_after}
-        
-    except discord.Forbidden:
-        print(f"Missing permissions to track invites in {member.guild.name}")
+        await warm_guild(guild, asyncio.Semaphore(1))
     except Exception as e:
-        print(f"Error tracking member join for {member.display_name}: {e}")
+        print(f"Warmup failed for new guild {guild.name}: {e}")
+
+@bot.event
+async def on_invite_create(invite):
+    if invite.guild is None:
+        return
+    
+    state = get_guild_state(invite.guild.id)
+    state.invite_cache[invite.code] = invite_cache_entry(invite)
+
+@bot.event
+async def on_invite_delete(invite):
+    if invite.guild is None:
+        return
+    
+    # Limited invites are deleted once their last use is consumed, so keep those
+    # until the next fetch in case a pending join needs to be credited to them
+    state = get_guild_state(invite.guild.id)
+    entry = state.invite_cache.get(invite.code)
+    if entry and not entry['max_uses']:
+        del state.invite_cache[invite.code]
 
 @bot.event
-async def on_member_remove(member):
+async def on_raw_member_remove(payload):
+    # The raw event fires for uncached members too, which is all of them in low memory mode
+    guild = bot.get_guild(payload.guild_id)
+    if guild is None:
+        return
+    state = get_guild_state(guild.id)
+    
     # Find who invited this user and decrement their count
-    for inviter_id, data in invite_settings['tracking'].items():
-        for invited_user in data['invited_users']:
-            if invited_user['user_id'] == member.id:
-                # Decrement invite count
-                if invite_settings['tracking'][inviter_id]['invites'] > 0:
-                    invite_settings['tracking'][inviter_id]['invites'] -= 1
-                
-                # Update roles for inviter
-                inviter = member.guild.get_member(inviter_id)
-                if inviter:
-                    invite_count = invite_settings['tracking'][inviter_id]['invites']
-                    await update_invite_roles(inviter, invite_count)
-                
-                # Mark user as left
-                invited_user['left_at'] = datetime.now().isoformat()
-                break
+    entry = state.invitee_index.pop(payload.user.id, None)
+    if entry is None:
+        return
+    
+    inviter_id, invited_user = entry
+    data = state.invite_tracking[inviter_id]
+    
+    # Decrement invite count
+    if data['invites'] > 0:
+        data['invites'] -= 1
+    
+    # Mark user as left
+    invited_user['left_at'] = datetime.now().isoformat()
+    state.persist('invite_tracking', inviter_id, data)
+    
+    # Update roles for inviter
+    inviter = await resolve_member(guild, inviter_id)
+    if inviter:
+        update_invite_roles(state, inviter, data['invites'])
+
+@bot.event
+async def on_guild_role_update(before, after):
+    state = get_guild_state(after.guild.id)
+    
+    # A role gaining or losing Administrator changes results for every role set that includes it
+    if before.permissions != after.permissions:
+        state.permission_cache.clear()
+    
+    # Autoresponders match on role IDs; keep the names shown in panels and exports current
+    if before.name != after.name:
+        for trigger, data in state.autoresponders.items():
+            if after.id in data.get('allowed_role_ids', ()):
+                data['allowed_roles'] = [role.name for role in map(after.guild.get_role, data['allowed_role_ids']) if role]
+                state.persist('autoresponders', trigger, data)
+
+@bot.event
+async def on_guild_role_delete(role):
+    get_guild_state(role.guild.id).permission_cache.clear()
+
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, MissingCommandPermission):
+        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
+        return
+    if isinstance(error, app_commands.CheckFailure):
+        return
+    
+    command_name = interaction.command.name if interaction.command else "unknown"
+    print(f"Error in command {command_name}:")
+    traceback.print_exception(error)
 
 # Command definitions with permission checks
 @bot.tree.command(name="config", description="Bot configuration panel")
+@require_permission("config")
 @guild_only()
 async def config_command(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "config", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
+    state = get_guild_state(interaction.guild_id)
     
     embed = discord.Embed(
         title="🔧 Bot Configuration Panel",
@@ -1966,16 +3943,13 @@ async def config_command(interaction: discord.Interaction):
     embed.add_field(name="🏠 Guild Settings", value="Configure guild restrictions", inline=False)
     embed.add_field(name="📋 View Config", value="See current configuration", inline=False)
     
-    view = ConfigView()
+    view = ConfigView(state)
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 @bot.tree.command(name="embedcreator", description="Create custom embeds with advanced options")
+@require_permission("embedcreator")
 @guild_only()
 async def embed_creator_command(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "embedcreator", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
-    
     embed = discord.Embed(
         title="🎨 Embed Creator",
         description="Create beautiful custom embeds:",
@@ -1987,17 +3961,73 @@ async def embed_creator_command(interaction: discord.Interaction):
     embed.add_field(name="🖼️ Set Images", value="Add thumbnail and bottom image", inline=False)
     embed.add_field(name="👁️ Preview", value="See how your embed looks", inline=False)
     embed.add_field(name="📤 Send to Channel", value="Post your embed", inline=False)
+    embed.add_field(name="💾 Save Template", value="Keep it for /send_embed_template", inline=False)
     
     view = EmbedCreatorView()
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
-@bot.tree.command(name="reactionroles", description="Create reaction role messages")
+@bot.tree.command(name="send_embed_template", description="Send a saved embed template to one or more channels")
+@app_commands.describe(name="The template to send", channels="Channel mentions or IDs, separated by spaces")
+@require_permission("send_embed_template")
 @guild_only()
-async def reaction_roles_command(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "reactionroles", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
+async def send_embed_template(interaction: discord.Interaction, name: str, channels: str):
+    state = get_guild_state(interaction.guild_id)
+    
+    payload = state.template_payloads.get(name)
+    if payload is None:
+        await interaction.response.send_message(f"No embed template named `{name}`.", ephemeral=True)
+        return
+    
+    targets = {}
+    unknown = []
+    for entry in channels.replace(',', ' ').split():
+        channel_id = entry.removeprefix('<#').removesuffix('>')
+        channel = interaction.guild.get_channel_or_thread(int(channel_id)) if channel_id.isdigit() else None
+        if isinstance(channel, discord.abc.Messageable):
+            targets[channel.id] = channel
+        else:
+            unknown.append(entry)
+    
+    if not targets:
+        await interaction.response.send_message("No valid channels given.", ephemeral=True)
+        return
+    
+    # Every channel gets the same prebuilt payload
+    for channel in targets.values():
+        send_queue.enqueue(channel, payload)
+    
+    message = f"Sending `{name}` to {', '.join(channel.mention for channel in targets.values())}."
+    if unknown:
+        message += f"\nUnknown channels: {', '.join(unknown)}"
+    await interaction.response.send_message(message, ephemeral=True)
+
+@bot.tree.command(name="delete_embed_template", description="Delete a saved embed template")
+@app_commands.describe(name="The template to delete")
+@require_permission("delete_embed_template")
+@guild_only()
+async def delete_embed_template(interaction: discord.Interaction, name: str):
+    state = get_guild_state(interaction.guild_id)
+    if name not in state.embed_templates:
+        await interaction.response.send_message(f"No embed template named `{name}`.", ephemeral=True)
         return
     
+    state.delete_embed_template(name)
+    await interaction.response.send_message(f"Deleted embed template `{name}`.", ephemeral=True)
+
+@send_embed_template.autocomplete('name')
+@delete_embed_template.autocomplete('name')
+async def embed_template_autocomplete(interaction: discord.Interaction, current: str):
+    if interaction.guild_id is None:
+        return []
+    state = get_guild_state(interaction.guild_id)
+    current = current.lower()
+    names = sorted(name for name in state.embed_templates if current in name.lower())
+    return [app_commands.Choice(name=name, value=name) for name in names[:25]]
+
+@bot.tree.command(name="reactionroles", description="Create reaction role messages")
+@require_permission("reactionroles")
+@guild_only()
+async def reaction_roles_command(interaction: discord.Interaction):
     embed = discord.Embed(
         title="⚡ Reaction Roles Setup",
         description="Create messages with reaction-based role assignment:",
@@ -2011,11 +4041,10 @@ async def reaction_roles_command(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 @bot.tree.command(name="boostsetup", description="Configure server boost tracking and roles")
+@require_permission("boostsetup")
 @guild_only()
 async def boost_setup_command(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "boostsetup", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
+    state = get_guild_state(interaction.guild_id)
     
     embed = discord.Embed(
         title="🚀 Boost Tracking Setup",
@@ -2025,15 +4054,14 @@ async def boost_setup_command(interaction: discord.Interaction):
     embed.add_field(name="🎯 Set Boost Roles", value="Configure roles for different boost levels", inline=False)
     embed.add_field(name="📊 View Settings", value="See current boost configuration", inline=False)
     
-    view = BoostSetupView()
+    view = BoostSetupView(state)
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 @bot.tree.command(name="invitesetup", description="Configure invite tracking and roles")
+@require_permission("invitesetup")
 @guild_only()
 async def invite_setup_command(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "invitesetup", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
+    state = get_guild_state(interaction.guild_id)
     
     embed = discord.Embed(
         title="📨 Invite Tracking Setup",
@@ -2043,22 +4071,21 @@ async def invite_setup_command(interaction: discord.Interaction):
     embed.add_field(name="🎯 Set Invite Roles", value="Configure roles for different invite levels", inline=False)
     embed.add_field(name="📊 View Settings", value="See current invite configuration", inline=False)
     
-    view = InviteSetupView()
+    view = InviteSetupView(state)
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 @bot.tree.command(name="invites", description="Check invite count for yourself or another member")
 @app_commands.describe(member="The member to check invite count for (optional)")
+@require_permission("invites")
 @guild_only()
 async def invites_command(interaction: discord.Interaction, member: Optional[discord.Member] = None):
-    if not has_permission(interaction.user.roles, "invites", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
+    state = get_guild_state(interaction.guild_id)
     
     target = member or interaction.user
     user_id = target.id
     
-    if user_id in invite_settings['tracking']:
-        data = invite_settings['tracking'][user_id]
+    if user_id in state.invite_tracking:
+        data = state.invite_tracking[user_id]
         invite_count = data['invites']
         
         embed = discord.Embed(
@@ -2083,11 +4110,10 @@ async def invites_command(interaction: discord.Interaction, member: Optional[dis
         await interaction.response.send_message(f"{target.display_name} has no tracked invites.", ephemeral=True)
 
 @bot.tree.command(name="autoresponder", description="Manage autoresponders with an interactive panel")
+@require_permission("autoresponder")
 @guild_only()
 async def autoresponder_command(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "autoresponder", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
+    state = get_guild_state(interaction.guild_id)
     
     embed = discord.Embed(
         title="🤖 Autoresponder Management Panel",
@@ -2110,15 +4136,14 @@ async def autoresponder_command(interaction: discord.Interaction):
         inline=False
     )
     
-    view = AutoresponderView()
+    view = AutoresponderView(state)
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 @bot.tree.command(name="autoresponders", description="Advanced autoresponder management panel")
+@require_permission("autoresponders")
 @guild_only()
 async def autoresponders_command(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "autoresponders", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
+    state = get_guild_state(interaction.guild_id)
     
     embed = discord.Embed(
         title="🛠️ Advanced Autoresponder Management",
@@ -2140,17 +4165,19 @@ async def autoresponders_command(interaction: discord.Interaction):
         value="Remove autoresponders",
         inline=False
     )
+    embed.add_field(
+        name="📺 Channels",
+        value="Choose which channels autoresponders reply in",
+        inline=False
+    )
     
-    view = AutoresponderManagementView()
+    view = AutoresponderManagementView(state)
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 @bot.tree.command(name="auctionsetup", description="Setup auction system configuration")
+@require_permission("auctionsetup")
 @guild_only()
 async def auction_setup(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "auctionsetup", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
-    
     embed = discord.Embed(
         title="🔧 Auction Setup Panel",
         description="Configure your auction system settings:",
@@ -2176,23 +4203,17 @@ async def auction_setup(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 @bot.tree.command(name="auctioncreate", description="Create a new auction with detailed options")
+@require_permission("auctioncreate")
 @guild_only()
 async def auction_create(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "auctioncreate", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
-    
     modal = AuctionCreateModal()
     await interaction.response.send_modal(modal)
 
 @bot.tree.command(name="connect4", description="Start a Connect 4 game with landmines")
 @app_commands.describe(opponent="The player you want to challenge")
+@require_permission("connect4")
 @guild_only()
 async def connect4_command(interaction: discord.Interaction, opponent: discord.Member):
-    if not has_permission(interaction.user.roles, "connect4", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
-    
     if interaction.channel.id in active_games:
         await interaction.response.send_message("There's already an active game in this channel!", ephemeral=True)
         return
@@ -2222,12 +4243,9 @@ async def connect4_command(interaction: discord.Interaction, opponent: discord.M
     await interaction.response.send_message(embed=embed, view=view)
 
 @bot.tree.command(name="endgame", description="End the current Connect 4 game")
+@require_permission("endgame")
 @guild_only()
 async def end_game_command(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "endgame", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
-    
     if interaction.channel.id not in active_games:
         await interaction.response.send_message("No active game in this channel!", ephemeral=True)
         return
@@ -2251,56 +4269,91 @@ async def end_game_command(interaction: discord.Interaction):
 
 @bot.tree.command(name="test_autoresponder", description="Test an autoresponder trigger")
 @app_commands.describe(trigger="The trigger word to test")
+@require_permission("test_autoresponder")
 @guild_only()
 async def test_autoresponder(interaction: discord.Interaction, trigger: str):
-    if not has_permission(interaction.user.roles, "test_autoresponder", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
+    state = get_guild_state(interaction.guild_id)
     
-    trigger_lower = trigger.lower()
+    # Autocomplete sends stored triggers as-is; typed ones are normalized to match
+    trigger_lower = trigger if trigger in state.autoresponders else normalize_trigger(trigger)
     
-    if trigger_lower not in autoresponders:
+    if trigger_lower not in state.autoresponders:
         await interaction.response.send_message(f"No autoresponder found for trigger: `{trigger}`", ephemeral=True)
         return
     
-    data = autoresponders[trigger_lower]
+    data = state.autoresponders[trigger_lower]
     
     # Check roles
-    if data['allowed_roles']:
-        user_roles = [role.name for role in interaction.user.roles]
-        if not any(role in user_roles for role in data['allowed_roles']):
-            await interaction.response.send_message("You don't have permission to use this autoresponder.", ephemeral=True)
-            return
+    if not state.autoresponder_allowed(trigger_lower, interaction.user):
+        await interaction.response.send_message("You don't have permission to use this autoresponder.", ephemeral=True)
+        return
     
     # Send test response
-    if data['is_embed'] and data['embed_title']:
+    response = state.prepared_responses[trigger_lower]
+    title, body = response.render(interaction.user, interaction.channel, data.get('uses', 0))
+    if response.is_embed:
         embed = discord.Embed(
-            title=f"🧪 TEST: {data['embed_title']}",
-            description=data['response'],
+            title=f"🧪 TEST: {title}",
+            description=body,
             color=0xff9900
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
     else:
-        await interaction.response.send_message(f"🧪 TEST RESPONSE:\n{data['response']}", ephemeral=True)
+        await interaction.response.send_message(f"🧪 TEST RESPONSE:\n{body}", ephemeral=True)
+
+@test_autoresponder.autocomplete('trigger')
+async def test_autoresponder_autocomplete(interaction: discord.Interaction, current: str):
+    if interaction.guild_id is None:
+        return []
+    state = get_guild_state(interaction.guild_id)
+    return [app_commands.Choice(name=trigger, value=trigger) for trigger in state.triggers_with_prefix(normalize_trigger(current))]
+
+@bot.tree.command(name="autoresponder_stats", description="Show how often autoresponders fire and how fast matching is")
+@require_permission("autoresponder_stats")
+@guild_only()
+async def autoresponder_stats(interaction: discord.Interaction):
+    state = get_guild_state(interaction.guild_id)
+    
+    embed = discord.Embed(title="📊 Autoresponder Statistics", color=0x7289da)
+    embed.add_field(name="Messages Evaluated", value=str(state.messages_evaluated), inline=True)
+    embed.add_field(
+        name="Match Time",
+        value=f"p50 ≤{state.latency_percentile(50)}µs, p99 ≤{state.latency_percentile(99)}µs",
+        inline=True
+    )
+    
+    # nlargest keeps this cheap even with thousands of triggers
+    hot_triggers = heapq.nlargest(10, state.trigger_stats.items(), key=lambda item: item[1][0])
+    if hot_triggers:
+        lines = [
+            f"`{trigger[:40]}`: {matched} matched, {sent} sent, {cooldown} on cooldown, {role} role-filtered"
+            for trigger, (matched, cooldown, role, sent) in hot_triggers
+        ]
+        embed.add_field(name="Most Matched Triggers", value="\n".join(lines)[:1024], inline=False)
+    else:
+        embed.add_field(name="Most Matched Triggers", value="No autoresponder has matched yet.", inline=False)
+    
+    embed.set_footer(text=f"Counters are saved every {STATS_FLUSH_INTERVAL} seconds")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="export_autoresponders", description="Export autoresponders configuration")
+@require_permission("export_autoresponders")
 @guild_only()
 async def export_autoresponders(interaction: discord.Interaction):
-    if not has_permission(interaction.user.roles, "export_autoresponders", interaction.user):
-        await interaction.response.send_message("❌ You need Administrator permissions or be assigned to specific roles to use this command.", ephemeral=True)
-        return
+    state = get_guild_state(interaction.guild_id)
     
-    if not autoresponders:
+    if not state.autoresponders:
         await interaction.response.send_message("No autoresponders to export.", ephemeral=True)
         return
     
     try:
         # Remove timestamps for export
         export_data = {}
-        for trigger, data in autoresponders.items():
+        for trigger, data in state.autoresponders.items():
             export_data[trigger] = {
                 'response': data['response'],
                 'cooldown': data['cooldown'],
+                'cooldown_scope': data.get('cooldown_scope', 'global'),
                 'allowed_roles': data['allowed_roles'],
                 'is_embed': data['is_embed'],
                 'embed_title': data['embed_title']
@@ -2317,6 +4370,178 @@ async def export_autoresponders(interaction: discord.Interaction):
     except Exception as e:
         await interaction.response.send_message(f"Error exporting autoresponders: {str(e)}", ephemeral=True)
 
+class AutoresponderImportError(Exception):
+    """An import file problem, tied to the line it was found on"""
+    def __init__(self, line, message):
+        super().__init__(message)
+        self.line = line
+
+def iter_import_entries(text):
+    """Yield (line, trigger, settings) from an export file one entry at a time"""
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'\s*')
+    counted_to = 0
+    line = 1
+    
+    def line_at(position):
+        # Positions only move forward, so newlines are counted once overall
+        nonlocal counted_to, line
+        line += text.count('\n', counted_to, position)
+        counted_to = position
+        return line
+    
+    def decode(position):
+        try:
+            return decoder.raw_decode(text, position)
+        except json.JSONDecodeError as e:
+            raise AutoresponderImportError(line_at(e.pos), f"Invalid JSON: {e.msg}")
+    
+    position = whitespace.match(text).end()
+    if text[position:position + 1] != '{':
+        raise AutoresponderImportError(line_at(position), "Expected a JSON object of trigger: settings, like the export")
+    position = whitespace.match(text, position + 1).end()
+    if text[position:position + 1] == '}':
+        return
+    
+    while True:
+        entry_line = line_at(position)
+        trigger, position = decode(position)
+        if not isinstance(trigger, str):
+            raise AutoresponderImportError(entry_line, "Expected a trigger string")
+        
+        position = whitespace.match(text, position).end()
+        if text[position:position + 1] != ':':
+            raise AutoresponderImportError(line_at(position), "Expected ':' after the trigger")
+        settings, position = decode(whitespace.match(text, position + 1).end())
+        yield entry_line, trigger, settings
+        
+        position = whitespace.match(text, position).end()
+        separator = text[position:position + 1]
+        if separator == ',':
+            position = whitespace.match(text, position + 1).end()
+        elif separator == '}':
+            if text[position + 1:].strip():
+                raise AutoresponderImportError(line_at(position + 1), "Unexpected data after the closing brace")
+            return
+        else:
+            raise AutoresponderImportError(line_at(position), "Expected ',' or '}' after an entry")
+
+def validate_import_entry(trigger, settings, guild, names):
+    """Turn one imported entry into (trigger, autoresponder data), raising ValueError"""
+    trigger = normalize_trigger(trigger)
+    problem = trigger_problem(trigger)
+    if problem:
+        raise ValueError(problem)
+    if len(trigger) > 100:
+        raise ValueError("Triggers are limited to 100 characters")
+    if not isinstance(settings, dict):
+        raise ValueError("Settings must be an object")
+    
+    response = settings.get('response')
+    if not isinstance(response, str) or not response or len(response) > 2000:
+        raise ValueError("'response' must be text of 1-2000 characters")
+    
+    cooldown = settings.get('cooldown', 0)
+    cooldown_scope = settings.get('cooldown_scope', 'global')
+    if not isinstance(cooldown, int) or isinstance(cooldown, bool) or cooldown < 0:
+        raise ValueError("'cooldown' must be a whole number of seconds")
+    if cooldown_scope not in COOLDOWN_SCOPES:
+        raise ValueError(f"'cooldown_scope' must be one of {', '.join(COOLDOWN_SCOPES)}")
+    
+    allowed_roles = settings.get('allowed_roles', [])
+    if not isinstance(allowed_roles, list) or not all(isinstance(role, str) for role in allowed_roles):
+        raise ValueError("'allowed_roles' must be a list of role names")
+    role_ids, unknown_roles = resolve_roles(guild, allowed_roles, names)
+    if unknown_roles:
+        raise ValueError(f"Unknown roles: {', '.join(unknown_roles)}")
+    
+    embed_title = settings.get('embed_title', '')
+    if not isinstance(embed_title, str) or len(embed_title) > 256:
+        raise ValueError("'embed_title' must be text of up to 256 characters")
+    
+    return trigger, {
+        'response': response,
+        'cooldown': cooldown,
+        'cooldown_scope': cooldown_scope,
+        'allowed_roles': [guild.get_role(role_id).name for role_id in role_ids],
+        'allowed_role_ids': role_ids,
+        'is_embed': bool(settings.get('is_embed', False)),
+        'embed_title': embed_title
+    }
+
+def parse_import(text, guild):
+    """Validate a whole import file, returning (autoresponders, listed errors, total error count)"""
+    imported = {}
+    errors = []
+    error_count = 0
+    names = roles_by_name(guild)
+    try:
+        for line, trigger, settings in iter_import_entries(text):
+            try:
+                trigger, data = validate_import_entry(trigger, settings, guild, names)
+                imported[trigger] = data
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < IMPORT_ERROR_LIMIT:
+                    errors.append(f"Line {line} (`{trigger[:50]}`): {e}")
+    except AutoresponderImportError as e:
+        error_count += 1
+        errors.append(f"Line {e.line}: {e}")
+    return imported, errors, error_count
+
+@bot.tree.command(name="import_autoresponders", description="Import autoresponders from an export file")
+@app_commands.describe(file="JSON file in the format produced by /export_autoresponders")
+@require_permission("import_autoresponders")
+@guild_only()
+async def import_autoresponders(interaction: discord.Interaction, file: discord.Attachment):
+    state = get_guild_state(interaction.guild_id)
+    
+    if file.size > IMPORT_MAX_BYTES:
+        await interaction.response.send_message(f"File is too large. The limit is {IMPORT_MAX_BYTES // (1024 * 1024)} MB.", ephemeral=True)
+        return
+    
+    # Large files take longer than the 3 second interaction window
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    
+    try:
+        text = (await file.read()).decode('utf-8-sig')
+    except UnicodeDecodeError:
+        await interaction.followup.send("File is not valid UTF-8 text.", ephemeral=True)
+        return
+    except discord.HTTPException as e:
+        await interaction.followup.send(f"Couldn't download the file: {e}", ephemeral=True)
+        return
+    
+    # Parsing only reads the guild's roles, so it can run off the event loop
+    imported, errors, error_count = await asyncio.to_thread(parse_import, text, interaction.guild)
+    del text
+    
+    # All or nothing, so a fixed file can simply be imported again
+    if error_count:
+        report = "\n".join(errors)
+        if error_count > len(errors):
+            report += f"\n...and {error_count - len(errors)} more"
+        await interaction.followup.send(f"❌ Nothing was imported, {error_count} problem(s) found:\n{report}"[:2000], ephemeral=True)
+        return
+    
+    if not imported:
+        await interaction.followup.send("The file has no autoresponders.", ephemeral=True)
+        return
+    
+    # Every put lands in the same storage batch, which is written in one transaction
+    created = 0
+    for trigger, data in imported.items():
+        if trigger not in state.autoresponders:
+            created += 1
+        state.autoresponders[trigger] = data
+        state.persist('autoresponders', trigger, data)
+    state.rebuild_trigger_matcher()
+    
+    await interaction.followup.send(
+        f"✅ Imported {len(imported)} autoresponder(s): {created} new, {len(imported) - created} updated.",
+        ephemeral=True
+    )
+
 # Load configuration from environment variables at startup
 import os
 
@@ -2335,6 +4560,13 @@ if guild_ids_env:
 else:
     ALLOWED_GUILD_IDS = []
 
+# Command-line flags
+FORCE_COMMAND_SYNC = '--force-sync' in sys.argv  # sync even if the command tree fingerprint is unchanged
+SYNC_TO_GUILDS = '--sync-guilds' in sys.argv  # sync to ALLOWED_GUILD_IDS instead of globally
+
+def handle_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
 # Run the bot
 if __name__ == "__main__":
     if not token:
@@ -2347,6 +4579,7 @@ if __name__ == "__main__":
         print("4. Run the bot again")
         print("\nOptional: Set ALLOWED_GUILD_IDS to restrict bot to specific servers")
         print("Format: comma-separated guild IDs (e.g., '123456789,987654321')")
+        print("\nFlags: --force-sync always syncs slash commands, --sync-guilds syncs them to ALLOWED_GUILD_IDS only")
         exit(1)
     else:
         print(f"Starting Discord bot...")
@@ -2355,13 +4588,8 @@ if __name__ == "__main__":
         else:
             print("Bot will work in all servers (no guild restrictions)")
         
-        # Initialize data structures
-        if 'invite_cache' not in invite_settings:
-            invite_settings['invite_cache'] = {}
-        if 'tracking' not in boost_settings:
-            boost_settings['tracking'] = {}
-        if 'tracking' not in invite_settings:
-            invite_settings['tracking'] = {}
+        # Cloud Run stops instances with SIGTERM; shut down like Ctrl+C so pending state gets written
+        signal.signal(signal.SIGTERM, handle_sigterm)
         
         try:
             bot.run(token)
@@ -2371,3 +4599,8 @@ if __name__ == "__main__":
         except Exception as e:
             print(f"Error starting bot: {e}")
             exit(1)
+        finally:
+            for state in guild_states.values():
+                state.persist_trigger_stats()
+            storage.close()
+            regex_worker.stop()
@@ -0,0 +1,133 @@
+"""Join attribution through process_pending_joins against a fake guild"""
+import asyncio
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeInvite:
+    def __init__(self, code, inviter_id, uses, max_uses=0):
+        self.code = code
+        self.inviter = FakeUser(inviter_id)
+        self.uses = uses
+        self.max_uses = max_uses
+
+
+class FakeMember:
+    def __init__(self, member_id, guild):
+        self.id = member_id
+        self.guild = guild
+        self.display_name = f"member{member_id}"
+
+    def __str__(self):
+        return self.display_name
+
+
+class FakeGuild:
+    """Guild whose invite list is whatever the test says the API currently reports"""
+    def __init__(self, guild_id, invites):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+        self.features = []
+        self.invites_by_code = {invite.code: invite for invite in invites}
+        self.fetches = 0
+
+    async def invites(self):
+        self.fetches += 1
+        return [FakeInvite(invite.code, invite.inviter.id, invite.uses, invite.max_uses) for invite in self.invites_by_code.values()]
+
+    def get_member(self, member_id):
+        return None
+
+    def use(self, code):
+        self.invites_by_code[code].uses += 1
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'INVITE_JOIN_WINDOW', 0)
+    monkeypatch.setattr(main.storage, 'path', str(tmp_path / 'bot.db'))
+    main.storage.open()
+    state = main.GuildState(1)
+    yield state
+    main.storage.close()
+
+
+def inviters(state):
+    return {inviter_id: data['invites'] for inviter_id, data in state.invite_tracking.items()}
+
+
+def join(guild, state, member_ids):
+    state.pending_joins.extend(FakeMember(member_id, guild) for member_id in member_ids)
+    asyncio.run(main.process_pending_joins(guild, state))
+
+
+def test_uncached_invites_are_a_baseline(state):
+    guild = FakeGuild(1, [FakeInvite('a', 100, 50), FakeInvite('b', 200, 30)])
+
+    # No snapshot yet: the join can't be attributed and must not leave 80 stale slots behind
+    guild.use('a')
+    join(guild, state, [1])
+    assert inviters(state) == {}
+    assert state.unclaimed_invite_uses == []
+
+    guild.use('b')
+    join(guild, state, [2])
+    assert inviters(state) == {200: 1}
+
+
+def test_unclaimed_uses_expire(state, monkeypatch):
+    guild = FakeGuild(1, [FakeInvite('a', 100, 0), FakeInvite('b', 200, 0)])
+    state.invite_cache = {code: main.invite_cache_entry(invite) for code, invite in guild.invites_by_code.items()}
+
+    # A use whose join event never arrives waits for a while, then stops claiming joins
+    guild.use('a')
+    guild.use('b')
+    join(guild, state, [1])
+    assert inviters(state) == {100: 1}
+    assert len(state.unclaimed_invite_uses) == 1
+
+    now = main.time.monotonic()
+    monkeypatch.setattr(main.time, 'monotonic', lambda: now + main.INVITE_SLOT_TTL + 1)
+    guild.use('a')
+    join(guild, state, [2])
+    assert inviters(state) == {100: 2}
+
+
+def test_burst_of_500_joins(state):
+    random.seed(5)
+    codes = {f"code{index}": 1000 + index for index in range(10)}
+    guild = FakeGuild(1, [FakeInvite(code, inviter_id, random.randrange(100)) for code, inviter_id in codes.items()])
+    state.invite_cache = {code: main.invite_cache_entry(invite) for code, invite in guild.invites_by_code.items()}
+
+    async def gateway():
+        expected = {}
+        for member_id in range(500):
+            code = random.choice(list(codes))
+            guild.use(code)
+            expected[codes[code]] = expected.get(codes[code], 0) + 1
+            await main.on_member_join(FakeMember(member_id, guild))
+            if member_id % 50 == 49:
+                await asyncio.sleep(0)
+        await state.invite_refresh
+        return expected
+
+    main.guild_states[guild.id] = state
+    try:
+        expected = asyncio.run(gateway())
+    finally:
+        del main.guild_states[guild.id]
+
+    assert sum(inviters(state).values()) == 500
+    assert inviters(state) == expected
+    assert guild.fetches < 500
@@ -0,0 +1,154 @@
+"""Reaction role debouncing and the role queue it feeds, including a giveaway burst against a backlog"""
+import asyncio
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+GIVEAWAY_MESSAGE = 1
+GIVEAWAY_ROLE = 100
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.members = {}
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+    def get_role(self, role_id):
+        return object()
+
+
+class FakeMember:
+    """Member whose edits take a while to land, like a busy role route"""
+    edit_latency = 0.004
+
+    def __init__(self, member_id, guild):
+        self.id = member_id
+        self.guild = guild
+        self.display_name = f"member{member_id}"
+        self._roles = []
+        self.edits = 0
+
+    async def edit(self, roles, reason=None):
+        await asyncio.sleep(self.edit_latency)
+        self.edits += 1
+        updated = FakeMember(self.id, self.guild)
+        updated._roles = [role.id for role in roles]
+        return updated
+
+
+@pytest.fixture
+def queues(monkeypatch):
+    monkeypatch.setattr(main, 'reaction_roles', {GIVEAWAY_MESSAGE: {'roles': {'🎉': GIVEAWAY_ROLE}, 'mode': 'toggle', 'limit': 0}})
+    monkeypatch.setattr(main, 'role_queue', main.RoleUpdateQueue(4))
+    monkeypatch.setattr(main, 'reaction_debouncer', main.ReactionRoleDebouncer(0.05))
+    return main.role_queue, main.reaction_debouncer
+
+
+def replay(events):
+    """Roles each member should end up with, applying every event on its own"""
+    config = main.reaction_roles[GIVEAWAY_MESSAGE]
+    expected = {}
+    for member_id, added in events:
+        main.apply_reaction_event(expected.setdefault(member_id, set()), config, GIVEAWAY_ROLE, added)
+    return expected
+
+
+def run(queue, debouncer, guild, events, pause):
+    async def gateway():
+        queue.start()
+        for member_id, added in events:
+            debouncer.add(guild.members[member_id], GIVEAWAY_MESSAGE, GIVEAWAY_ROLE, added)
+            if pause:
+                await asyncio.sleep(pause)
+        while debouncer.pending or queue.pending or queue.in_flight:
+            await asyncio.sleep(0.01)
+        for worker in queue.workers:
+            worker.cancel()
+
+    asyncio.run(gateway())
+
+
+def test_unreact_while_add_is_still_queued(queues):
+    queue, debouncer = queues
+    guild = FakeGuild(1)
+    guild.members = {5: FakeMember(5, guild)}
+
+    async def scenario():
+        debouncer.add(guild.members[5], GIVEAWAY_MESSAGE, GIVEAWAY_ROLE, True)
+        await asyncio.sleep(0.07)
+        assert queue.pending  # the add hasn't been applied yet
+        debouncer.add(guild.members[5], GIVEAWAY_MESSAGE, GIVEAWAY_ROLE, False)
+        await asyncio.sleep(0.07)
+        queue.start()
+        while queue.pending or queue.in_flight:
+            await asyncio.sleep(0.01)
+        for worker in queue.workers:
+            worker.cancel()
+
+    asyncio.run(scenario())
+    assert guild.members[5]._roles == []
+
+
+def test_giveaway_burst_ends_in_the_right_roles(queues):
+    queue, debouncer = queues
+    random.seed(22)
+    guild = FakeGuild(1)
+    guild.members = {member_id: FakeMember(member_id, guild) for member_id in range(400)}
+
+    # About 1000 events at 1k per second: everyone reacts, some undo it and some react again later
+    events = []
+    for member_id in guild.members:
+        events.append((random.random(), member_id, True))
+        for _ in range(random.choice((0, 0, 1, 2, 3))):
+            events.append((events[-1][0] + random.random() * 0.2, member_id, not events[-1][2]))
+    events = [(member_id, added) for _, member_id, added in sorted(events)]
+
+    run(queue, debouncer, guild, events, 1 / 1000)
+
+    expected = replay(events)
+    assert {member_id: set(member._roles) for member_id, member in guild.members.items()} == expected
+    edits = sum(member.edits for member in guild.members.values())
+    assert edits < len(events) / 2
+    assert debouncer.calls_saved() > 0
+
+
+class FakeHTTP:
+    """Role routes of discord.py's HTTP client, applied to the roles the server really has"""
+    def __init__(self, server_roles):
+        self.server_roles = server_roles
+        self.calls = []
+
+    async def add_role(self, guild_id, user_id, role_id, reason=None):
+        self.calls.append(('add', role_id))
+        self.server_roles.add(role_id)
+
+    async def remove_role(self, guild_id, user_id, role_id, reason=None):
+        self.calls.append(('remove', role_id))
+        self.server_roles.discard(role_id)
+
+
+def test_low_memory_edits_leave_other_roles_alone(queues, monkeypatch):
+    queue, _ = queues
+    guild = FakeGuild(1)
+    member = FakeMember(5, guild)
+    member._roles = [7, 8]  # snapshot from a reaction payload
+
+    # A moderator removes role 8 and adds role 9 after the snapshot was taken
+    http = FakeHTTP({7, 9})
+    monkeypatch.setattr(main, 'LOW_MEMORY_MODE', True)
+    monkeypatch.setattr(main.bot, 'http', http)
+
+    queue.enqueue(member, add={GIVEAWAY_ROLE}, remove={7}, reason="Reaction role")
+    asyncio.run(queue.apply(queue.next_change()))
+
+    assert http.server_roles == {9, GIVEAWAY_ROLE}
+    assert sorted(http.calls) == [('add', GIVEAWAY_ROLE), ('remove', 7)]
+    assert member.edits == 0
@@ -0,0 +1,76 @@
+"""Regex trigger guard, glob matching and the regex worker timeout"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+@pytest.mark.parametrize('pattern', [
+    '(?:a{1,15}){1,15}b',
+    '(?:a|a){15}b',
+    '(a+)+b',
+    '(a|aa)*b',
+    '(x|x)*y',
+    '(?:a{1,3})*b',
+    'a?' * 20 + 'a' * 20,
+    '(?:ab{3}){50}',
+    '.*.*x',
+    '.*a.*a.*b',
+    r'(\w)\1',
+])
+def test_unsafe_regexes_are_rejected(pattern):
+    assert main.trigger_problem(f"regex:{pattern}")
+
+
+@pytest.mark.parametrize('pattern', [
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}',
+    r'\b(hi|hello|hey)\b',
+    r'https?://\S+',
+    'colou?r',
+    '(?:ab{3}){5}c',
+    '.*a.*b',
+])
+def test_accepted_regexes_stay_fast(pattern):
+    assert main.trigger_problem(f"regex:{pattern}") is None
+    regex = main.compile_trigger_pattern('regex', pattern)
+    for text in ('a' * main.REGEX_TEXT_LIMIT, 'ab' * 100, '1.' * 100):
+        start = time.perf_counter()
+        regex.search(text)
+        assert time.perf_counter() - start < main.REGEX_TIMEOUT
+
+
+def test_glob_question_marks_scan_linearly():
+    glob = main.GlobPattern('*a?c*')
+    assert glob.match('xxabcxx')
+    assert not glob.match('xxabxx')
+
+    text = 'ab' * 20000
+    start = time.perf_counter()
+    assert not main.GlobPattern('*a?c*').match(text)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_runaway_regex_is_killed_and_reported():
+    # Saved before the guard existed, so only the worker timeout stands between it and the event loop
+    engine = main.TriggerEngine(['regex:hello', 'regex:(?:a|a)*b', 'hello'])
+
+    async def run():
+        try:
+            start = time.perf_counter()
+            found = await engine.find_all_with_patterns('a' * 40 + ' hello')
+            elapsed = time.perf_counter() - start
+            again = await engine.find_all_with_patterns('hello there')
+            return found, elapsed, again
+        finally:
+            main.regex_worker.stop()
+
+    found, elapsed, again = asyncio.run(run())
+    assert elapsed < main.REGEX_TIMEOUT + 1
+    assert found == ['hello']
+    assert engine.slow == ['regex:(?:a|a)*b']
+    assert again == ['regex:hello', 'hello']